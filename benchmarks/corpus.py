@@ -0,0 +1,63 @@
+"""Genererer syntetiske sitat til benchmarks. Trenger ingen Discord-tilkobling."""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from quote import Quote
+
+FIRST_NAMES = [
+    "Thorbjørn", "Ingrid", "Sigurd", "Åse", "Kjetil", "Solveig", "Håkon", "Marte",
+    "Øystein", "Ragnhild", "Eirik", "Sunniva", "Bjørn", "Ragnar", "Tuva", "Jørgen",
+    "Signe", "Vegard", "Astrid", "Torstein", "Kari", "Ola", "Live", "Aksel",
+]
+LAST_INITIALS = ["", "", "", " D.", " H.", " S.", " Ø."]
+WORDS = (
+    "jeg har aldri sagt det der og kommer aldri til å si det igjen hvem har spist "
+    "maten min det er ikke min skyld at vaskemaskinen står på kjøkkenet i natt "
+    "skal vi på hytta bare én øl til så går vi hjem hvorfor er det alltid så kaldt "
+    "på badet kan noen ta oppvasken før fredag eller skal jeg gjøre det selv"
+).split()
+
+
+def random_name(rng: random.Random) -> str:
+    return rng.choice(FIRST_NAMES) + rng.choice(LAST_INITIALS)
+
+
+def random_quote_text(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.choices([1, 2, 3], weights=[6, 3, 1])[0]):
+        lines.append(" ".join(rng.choices(WORDS, k=rng.randint(3, 14))))
+    return "\n".join(lines)
+
+
+def generate_quote_fields(
+    rng: random.Random, message_id: int
+) -> tuple[str, list[str], str, int]:
+    speaker = random_name(rng)
+    audience = [random_name(rng) for _ in range(rng.choices([0, 1, 2, 3], weights=[4, 3, 2, 1])[0])]
+    return speaker, audience, random_quote_text(rng), message_id
+
+
+def generate_quotes(count: int, seed: int = 0) -> list[Quote]:
+    rng = random.Random(seed)
+    return [Quote(*generate_quote_fields(rng, i)) for i in range(count)]
+
+
+def format_header(speaker: str, audience: list[str]) -> str:
+    """'X til Y, Z og W' slik sitatene skrives i #quotes"""
+    if len(audience) == 0:
+        return speaker
+    if len(audience) == 1:
+        return f"{speaker} til {audience[0]}"
+    return f"{speaker} til {', '.join(audience[:-1])} og {audience[-1]}"
+
+
+def generate_raw_message(rng: random.Random, quote_count: int, message_id: int) -> str:
+    """En Discord-melding med quote_count sitat, adskilt med tomme linjer"""
+    raw_quotes = []
+    for _ in range(quote_count):
+        speaker, audience, text, _ = generate_quote_fields(rng, message_id)
+        raw_quotes.append(f'{format_header(speaker, audience)}\n"{text}"')
+    return "\n\n".join(raw_quotes)
@@ -0,0 +1,126 @@
+"""
+En lokal erstatning for de delene av discord.py som boten bruker: klient, server,
+kanaler, brukere og meldinger. Hendelsene som bot.run_bot registrerer blir fanget opp
+av FakeClient og kan kalles direkte, uten token eller nettverk.
+"""
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Coroutine, Optional
+
+_ids = itertools.count(1_000_000)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeUser:
+    def __init__(
+        self, name: str, user_id: Optional[int] = None, bot: bool = False, admin: bool = False
+    ) -> None:
+        self.id = user_id if user_id is not None else next_id()
+        self.name = name
+        self.bot = bot
+        self.guild_permissions = SimpleNamespace(administrator=admin)
+        self.mention = f"<@{self.id}>"
+        self.guild: Optional[FakeGuild] = None
+        self.sent: list[str] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        self.sent.append(content or "")
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+
+class FakeChannel:
+    """Tekstkanal som tar vare på alt som blir sendt, med valgfri kunstig forsinkelse"""
+
+    def __init__(self, name: str, channel_id: Optional[int] = None, send_latency: float = 0.0) -> None:
+        self.id = channel_id if channel_id is not None else next_id()
+        self.name = name
+        self.send_latency = send_latency
+        self.guild: Optional[FakeGuild] = None
+        self.sent: list[tuple[float, str]] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> None:
+        if self.send_latency != 0:
+            await asyncio.sleep(self.send_latency)
+        self.sent.append((time.perf_counter(), content or ""))
+
+
+class FakeGuild:
+    def __init__(self, name: str, channels: list[FakeChannel]) -> None:
+        self.id = next_id()
+        self.name = name
+        self.text_channels = channels
+        self.members: list[FakeUser] = []
+        for channel in channels:
+            channel.guild = self
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        for channel in self.text_channels:
+            if channel.id == channel_id:
+                return channel
+        return None
+
+    def join(self, user: FakeUser) -> FakeUser:
+        user.guild = self
+        self.members.append(user)
+        return user
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        content: str,
+        channel: FakeChannel,
+        author: FakeUser,
+        message_id: Optional[int] = None,
+    ) -> None:
+        self.id = message_id if message_id is not None else next_id()
+        self.content = content
+        self.channel = channel
+        self.author = author
+        self.guild = channel.guild
+
+    def edited(self, content: str) -> "FakeMessage":
+        """Samme melding (samme ID) med nytt innhold, slik on_message_edit får den"""
+        return FakeMessage(content, self.channel, self.author, self.id)
+
+
+EventHandler = Callable[..., Coroutine[Any, Any, None]]
+
+
+class FakeClient:
+    """
+    Tar imot @client.event-registreringene fra bot.run_bot.
+    run() gjør ingenting, så run_bot returnerer og hendelsene kan kalles med dispatch().
+    """
+
+    def __init__(self) -> None:
+        self.user = FakeUser("teknobyen-bot", bot=True)
+        self.guilds: list[FakeGuild] = []
+        self.events: dict[str, EventHandler] = {}
+
+    def event(self, coro: EventHandler) -> EventHandler:
+        self.events[coro.__name__] = coro
+        return coro
+
+    def run(self, token: str) -> None:
+        pass
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        for guild in self.guilds:
+            for channel in guild.text_channels:
+                if channel.id == channel_id:
+                    return channel
+        return None
+
+    async def dispatch(self, event: str, *args: Any) -> None:
+        await self.events["on_" + event](*args)
@@ -0,0 +1,265 @@
+"""
+Lasttest av bot-hendelsene mot fake_discord, uten token eller nettverk.
+
+Setter opp en server med #quotes, #welcome, #quotes-interactive og vanlige chat-kanaler,
+registrerer hendelsene fra bot.run_bot og sender dem inn i et gitt tempo:
+
+    paste   ny melding i #quotes med flere sitat
+    edit    endring av en tidligere paste
+    delete  sletting av en tidligere paste
+    join    nytt medlem (velkomstmelding)
+    command !search/!random i #quotes-interactive
+    chat    melding i en kanal boten ikke bryr seg om
+
+    python benchmarks/load_test.py --rate 200 --duration 10 --mix paste=3,edit=1,delete=1,join=1,command=2,chat=10
+    python benchmarks/load_test.py --burst 500 --mix paste=1
+
+Rapporterer antall, gjennomstrømning og p50/p99 handler-latens per hendelsestype,
+og kan skrive resultatet som JSON med --json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from corpus import generate_raw_message
+from fake_discord import FakeChannel, FakeClient, FakeGuild, FakeMessage, FakeUser
+
+QUOTES_ID = 1
+WELCOME_ID = 2
+INTERACTIVE_ID = 3
+CHAT_CHANNELS = 20
+
+# channels.py leser kanal-IDene når den importeres
+os.environ.setdefault("quotes", str(QUOTES_ID))
+os.environ.setdefault("welcome", str(WELCOME_ID))
+os.environ.setdefault("quotes-interactive", str(INTERACTIVE_ID))
+
+import metrics
+import output
+import watchdog
+from bot import run_bot
+from database import AsyncDatabase, Database
+
+EVENT_TYPES = ["paste", "edit", "delete", "join", "command", "chat"]
+SEARCH_WORDS = ["øl", "hytta", "maten", "kaldt", "oppvasken", '"bare én øl"']
+
+
+@dataclass
+class EventStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        if len(latencies) == 0:
+            return {"count": 0, "errors": self.errors}
+        return {
+            "count": len(latencies),
+            "errors": self.errors,
+            "per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        }
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, round(p / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in EVENT_TYPES:
+            raise ValueError(f"Ukjent hendelse {name}, velg blant {EVENT_TYPES}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, database: Database, send_latency: float, quotes_per_paste: int, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.quotes_per_paste = quotes_per_paste
+        self.quotes = FakeChannel("quotes", QUOTES_ID, send_latency)
+        self.welcome = FakeChannel("welcome", WELCOME_ID, send_latency)
+        self.interactive = FakeChannel("quotes-interactive", INTERACTIVE_ID, send_latency)
+        self.chat = [FakeChannel(f"chat-{i}", send_latency=send_latency) for i in range(CHAT_CHANNELS)]
+        self.guild = FakeGuild(
+            "Teknobyen", [self.quotes, self.welcome, self.interactive, *self.chat]
+        )
+        self.users = [self.guild.join(FakeUser(f"user-{i}")) for i in range(50)]
+        self.client = FakeClient()
+        self.client.guilds.append(self.guild)
+        run_bot(self.client, "fake-token", database)
+
+        self.pastes: list[FakeMessage] = []
+        self.loop_lag: dict[str, float] = {}
+        self.stats = {event: EventStats() for event in EVENT_TYPES}
+
+    def paste_content(self) -> str:
+        return generate_raw_message(self.rng, self.quotes_per_paste, 0)
+
+    def next_event(self, event: str) -> Callable[[], Awaitable[None]]:
+        """Lager hendelsen nå, så tilstanden (pastes) følger rekkefølgen hendelsene sendes i"""
+        client = self.client
+        author = self.rng.choice(self.users)
+        if event == "edit" and len(self.pastes) != 0:
+            old = self.rng.choice(self.pastes)
+            new = old.edited(self.paste_content())
+            self.pastes[self.pastes.index(old)] = new
+            return lambda: client.dispatch("message_edit", old, new)
+        if event == "delete" and len(self.pastes) != 0:
+            message = self.pastes.pop(self.rng.randrange(len(self.pastes)))
+            return lambda: client.dispatch("message_delete", message)
+        if event == "join":
+            member = self.guild.join(FakeUser(f"new-{len(self.guild.members)}"))
+            return lambda: client.dispatch("member_join", member)
+        if event == "command":
+            command = self.rng.choice(
+                [f"!search {self.rng.choice(SEARCH_WORDS)}", "!random", "!help search"]
+            )
+            message = FakeMessage(command, self.interactive, author)
+            return lambda: client.dispatch("message", message)
+        if event == "chat":
+            message = FakeMessage("hei alle sammen", self.rng.choice(self.chat), author)
+            return lambda: client.dispatch("message", message)
+        # paste, og edit/delete før det finnes noe å endre
+        message = FakeMessage(self.paste_content(), self.quotes, author)
+        self.pastes.append(message)
+        return lambda: client.dispatch("message", message)
+
+    async def timed(self, event: str, handler: Callable[[], Awaitable[None]]) -> None:
+        start = time.perf_counter()
+        try:
+            await handler()
+        except Exception as err:
+            self.stats[event].errors += 1
+            print(f"{event}: {type(err).__name__}: {err}", file=sys.stderr)
+            return
+        self.stats[event].latencies.append(time.perf_counter() - start)
+
+    async def run(self, events: list[str], rate: float) -> float:
+        """Sender hendelsene i et fast tempo (rate per sekund, 0 = alle på en gang), slik
+        discord.py starter en ny task per hendelse uten å vente på den forrige.
+
+        Returns:
+            float: sekunder fra første hendelse til alle er ferdige
+        """
+        # Som etter innlogging: kanal-objektene blir bundet og vakthunden startet
+        await self.client.dispatch("ready")
+        tasks = []
+        start = time.perf_counter()
+        for i, event in enumerate(events):
+            if rate > 0:
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.timed(event, self.next_event(event))))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        loop_watchdog = watchdog.get_watchdog()
+        if loop_watchdog is not None:
+            loop_watchdog.stop()
+            self.loop_lag = loop_watchdog.percentiles()
+        return elapsed
+
+    def sent_messages(self) -> int:
+        channels = [self.quotes, self.welcome, self.interactive, *self.chat]
+        return sum(len(channel.sent) for channel in channels) + sum(
+            len(user.sent) for user in self.guild.members
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lasttest av bot-hendelsene uten Discord")
+    parser.add_argument("--rate", type=float, default=100, help="hendelser per sekund")
+    parser.add_argument("--duration", type=float, default=5, help="sekunder med hendelser")
+    parser.add_argument("--burst", type=int, help="send så mange hendelser på en gang i stedet")
+    parser.add_argument("--mix", default="paste=3,edit=1,delete=1,join=1,command=2,chat=10")
+    parser.add_argument("--quotes-per-paste", type=int, default=5)
+    parser.add_argument("--send-latency-ms", type=float, default=0, help="kunstig forsinkelse per send")
+    parser.add_argument(
+        "--no-rate-limit", action="store_true", help="send uten å vente på Discord-grensen per kanal"
+    )
+    parser.add_argument("--backend", choices=["sync", "async"], default="async")
+    parser.add_argument("--flush-interval-ms", type=int, help="write-behind i Database")
+    parser.add_argument("--metrics", action="store_true", help="slå på metrics og vis !stats til slutt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="skriv resultatet som JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.no_rate_limit:
+        output.set_rate_limit(None)
+    if args.metrics:
+        metrics.enable()
+    count = args.burst if args.burst is not None else int(args.rate * args.duration)
+    rate = 0 if args.burst is not None else args.rate
+    rng = random.Random(args.seed)
+    events = rng.choices(list(mix), weights=list(mix.values()), k=count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_type = AsyncDatabase if args.backend == "async" else Database
+        database = database_type(
+            Path(tmp_dir) / ".database",
+            Path(tmp_dir) / ".ID",
+            flush_interval_ms=args.flush_interval_ms,
+        )
+        load_test = LoadTest(database, args.send_latency_ms / 1000, args.quotes_per_paste, args.seed)
+        try:
+            elapsed = asyncio.run(load_test.run(events, rate))
+        finally:
+            database.close()
+
+    results = {
+        "events": count,
+        "elapsed_s": round(elapsed, 3),
+        "per_second": round(count / elapsed, 1),
+        "sent_messages": load_test.sent_messages(),
+        "loop_lag": load_test.loop_lag,
+        "by_event": {
+            event: stats.summary(elapsed)
+            for event, stats in load_test.stats.items()
+            if len(stats.latencies) != 0 or stats.errors != 0
+        },
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    if args.metrics:
+        print(metrics.summary(), end="\n\n")
+
+    print(
+        f"{count} hendelser på {elapsed:.2f}s ({results['per_second']}/s), "
+        f"{results['sent_messages']} meldinger sendt"
+    )
+    if len(load_test.loop_lag) != 0:
+        print(
+            f"Event-loop-forsinkelse: p50 {load_test.loop_lag['p50_ms']} ms, "
+            f"p99 {load_test.loop_lag['p99_ms']} ms, maks {load_test.loop_lag['max_ms']} ms"
+        )
+    print(f"{'hendelse':>9} {'antall':>7} {'feil':>5} {'per s':>8} {'p50':>9} {'p99':>9} {'maks':>9}")
+    for event, summary in results["by_event"].items():
+        if summary["count"] == 0:
+            print(f"{event:>9} {0:>7} {summary['errors']:>5}")
+            continue
+        print(
+            f"{event:>9} {summary['count']:>7} {summary['errors']:>5} {summary['per_second']:>8} "
+            f"{summary['p50_ms']:>7.2f}ms {summary['p99_ms']:>7.2f}ms {summary['max_ms']:>7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
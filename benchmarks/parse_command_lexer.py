@@ -0,0 +1,47 @@
+"""
+Sammenligner den gamle parseren (som kopierer halen av strengen for hver del)
+med Lexer i parse_command på stadig lengre kommandoer med hermetegn.
+
+    python benchmarks/parse_command_lexer.py [antall gjentakelser]
+"""
+import sys
+import time
+from typing import Callable
+
+import corpus  # Legger src til i sys.path
+import legacy_parse_command
+import parse_command
+
+
+def long_command(parts: int) -> str:
+    arguments = " ".join(
+        f'"sitat nummer {i} med mange ord" ord{i} -rf' for i in range(parts)
+    )
+    return f"search {arguments} --limit 5"
+
+
+def timed(parser: Callable, command: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser(command)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat: int) -> None:
+    print(f"{'lengde':>8} {'gammel':>10} {'lexer':>10} {'faktor':>7}")
+    for parts in [1, 10, 100, 1000]:
+        command = long_command(parts)
+        old_result = legacy_parse_command.command_parser(command)
+        new_result = parse_command.command_parser(command)
+        # Flagg sist i en kommando får den gamle parseren til å krasje, så de står ikke sist her
+        assert str(old_result.unwrap()[0]) == str(new_result.unwrap()[0])
+        old_time = timed(legacy_parse_command.command_parser, command, repeat)
+        new_time = timed(parse_command.command_parser, command, repeat)
+        print(
+            f"{len(command):>8} {old_time * 1e6:8.0f}us {new_time * 1e6:8.0f}us "
+            f"{old_time / new_time:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,59 @@
+"""
+Sammenligner minnebruken til den gamle Quote (vanlig @dataclass med liste som audience)
+og den nye (slots, frozen, tuple-audience og internerte navn) på et generert korpus.
+
+    python benchmarks/quote_memory.py [antall]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from corpus import generate_quote_fields
+from quote import Quote
+
+
+@dataclass
+class LegacyQuote:
+    speaker: str
+    audience: list[str]
+    quote: str
+    message_id: int
+
+
+def measure(build: Callable[[], list]) -> tuple[int, list]:
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, objects
+
+
+def main(count: int) -> None:
+    rng = random.Random(0)
+    fields = [generate_quote_fields(rng, i) for i in range(count)]
+
+    # Navnene lages som nye strenger for hvert sitat, slik de gjør når de parses fra Discord
+    legacy_size, _ = measure(
+        lambda: [
+            LegacyQuote("".join(s), ["".join(n) for n in a], q, m)
+            for s, a, q, m in fields
+        ]
+    )
+    compact_size, _ = measure(
+        lambda: [
+            Quote("".join(s), ["".join(n) for n in a], q, m) for s, a, q, m in fields
+        ]
+    )
+
+    print(f"{count} sitat (sitatteksten er felles og ikke talt med)")
+    print(f"  LegacyQuote: {legacy_size / 1024 / 1024:8.2f} MiB")
+    print(f"  Quote:       {compact_size / 1024 / 1024:8.2f} MiB")
+    print(f"  Sparing:     {100 * (1 - compact_size / legacy_size):8.1f} %")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,185 @@
+"""
+Benchmarks for hele sitat-løypa på syntetiske korpus: formattering, legge til, slette,
+duplikatsjekk, lagring/lasting, tilfeldig sitat og edit/delete i QuotesHandler.
+Trenger ingen Discord-tilkobling.
+
+    python benchmarks/quote_pipeline.py [--sizes 1000 10000 ...] [--output resultater.jsonl]
+
+Hvert resultat er én JSON-linje, så to kjøringer kan sammenlignes linje for linje:
+    {"benchmark": "add_quotes", "size": 10000, "ops": 100, "seconds": 0.012, "us_per_op": 120.0, ...}
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, TextIO
+
+from corpus import generate_quotes, generate_raw_message
+from fake_discord import FakeChannel, FakeMessage, FakeUser
+
+# QuotesHandler leser kanal-IDen fra miljøet når den opprettes
+os.environ.setdefault("quotes", "0")
+
+import output
+import quote_utils
+from database import Database
+from message_handler import QuotesHandler
+from quote import Quote
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class Recorder:
+    def __init__(self, output: TextIO, commit: str) -> None:
+        self.output = output
+        self.commit = commit
+
+    def measure(self, name: str, size: int, ops: int, action: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        action()
+        seconds = time.perf_counter() - start
+        self.record(name, size, ops, seconds)
+
+    def record(self, name: str, size: int, ops: int, seconds: float) -> None:
+        result = {
+            "benchmark": name,
+            "size": size,
+            "ops": ops,
+            "seconds": round(seconds, 6),
+            "us_per_op": round(seconds / ops * 1e6, 3),
+            "commit": self.commit,
+            "python": sys.version.split()[0],
+        }
+        self.output.write(json.dumps(result) + "\n")
+        self.output.flush()
+
+
+def build_database(directory: Path, quotes: list[Quote]) -> Database[Quote]:
+    database: Database[Quote] = Database(directory / ".database", directory / ".ID")
+    with database.transaction():
+        for quote in quotes:
+            database.set_value(database.create_new_quote_ID().unwrap(), quote)
+    return database
+
+
+def batches(items: list[Any], size: int) -> Iterator[list[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def run_size(recorder: Recorder, size: int, seed: int) -> None:
+    rng = random.Random(seed)
+    quotes = generate_quotes(size, seed)
+
+    # Formattering av en melding med 10 sitat
+    messages = [generate_raw_message(rng, 10, i) for i in range(100)]
+    recorder.measure(
+        "format_quotes", size, len(messages),
+        lambda: [quote_utils.format_quotes(message, i) for i, message in enumerate(messages)],
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir)
+        start = time.perf_counter()
+        database = build_database(directory, quotes)
+        recorder.record("database_build", size, size, time.perf_counter() - start)
+
+        new_quotes = generate_quotes(1000, seed + 1)
+        recorder.measure(
+            "add_quotes", size, len(new_quotes),
+            lambda: [quote_utils.add_quotes(batch, database) for batch in batches(new_quotes, 10)],
+        )
+
+        lookups = [rng.choice(quotes) for _ in range(1000)]
+        recorder.measure(
+            "quote_is_in_database", size, len(lookups),
+            lambda: [quote_utils.quote_is_in_database(quote, database) for quote in lookups],
+        )
+
+        keys = rng.sample(database.keys(), min(1000, size))
+        recorder.measure(
+            "remove_quotes", size, len(keys),
+            lambda: [quote_utils.remove_quotes(batch, database) for batch in batches(keys, 10)],
+        )
+
+        recorder.measure(
+            "get_random_element", size, 10_000,
+            lambda: [database.get_random_element() for _ in range(10_000)],
+        )
+        recorder.measure(
+            "get_random_element_weighted", size, 10_000,
+            lambda: [database.get_random_element(weighted=True) for _ in range(10_000)],
+        )
+
+        # Måler håndteringen, ikke ventingen på Discord-grensen i den ene kanalen
+        output.set_rate_limit(None)
+        handler = QuotesHandler()
+        channel = FakeChannel("quotes")
+        author = FakeUser("Kari")
+        messages = [
+            FakeMessage(generate_raw_message(rng, 3, 0), channel, author, size + 10_000 + i)
+            for i in range(100)
+        ]
+        edits = [(message, message.edited(generate_raw_message(rng, 3, 0))) for message in messages]
+
+        async def edit_and_delete() -> None:
+            for old_message, new_message in edits:
+                await handler.on_new_message(old_message, database)
+            start = time.perf_counter()
+            for old_message, new_message in edits:
+                await handler.on_edit_message(old_message, new_message, database)
+            recorder.record("on_edit_message", size, len(edits), time.perf_counter() - start)
+            start = time.perf_counter()
+            for _, new_message in edits:
+                await handler.on_delete_message(new_message, database)
+            recorder.record("on_delete_message", size, len(edits), time.perf_counter() - start)
+
+        asyncio.run(edit_and_delete())
+
+        recorder.measure("save_data", size, 1, database.save_data)
+        database.close()
+        # Snapshotet er nettopp skrevet, så lastingen leser det og en nesten tom journal
+        recorder.measure(
+            "database_load", size, 1,
+            lambda: Database(directory / ".database", directory / ".ID").close(),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--output", type=Path, help="JSON-linjer hit i stedet for stdout")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output is not None else sys.stdout
+    try:
+        recorder = Recorder(output, git_commit())
+        for size in args.sizes:
+            run_size(recorder, size, args.seed)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Sammenligner det gamle dill-snapshotet med JSON-linje-formatet i storage_format:
+lagre- og lastetid, filstørrelse og hvor lang tid det tar å importere dill.
+
+    python benchmarks/storage_load.py [antall ...]
+
+Uten argumenter kjøres 10k, 100k og 1M sitat.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from corpus import generate_quotes
+from quote import Quote
+import storage_format
+
+
+def timed(action: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def import_time(module: str) -> float:
+    """Importtid i en ny prosess, slik den blir ved en kald oppstart"""
+    code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env
+    )
+    return float(output.stdout)
+
+
+def save_dill(path: Path, data: dict[int, Quote]) -> None:
+    import dill
+
+    with open(path, "wb") as file:
+        dill.dump(data, file)
+
+
+def load_dill(path: Path) -> dict[int, Quote]:
+    import dill
+
+    with open(path, "rb") as file:
+        return dill.load(file)
+
+
+def save_lines(path: Path, data: dict[int, Quote]) -> None:
+    with open(path, "wb") as file:
+        storage_format.write_snapshot(file, data, len(data))
+
+
+def load_lines(path: Path) -> dict[int, Quote]:
+    with open(path, "rb") as file:
+        return storage_format.read_snapshot(file)[0]
+
+
+def main(counts: list[int]) -> None:
+    formats = [("dill", save_dill, load_dill), ("jsonl", save_lines, load_lines)]
+    print(f"import dill:           {import_time('dill') * 1000:8.1f} ms")
+    print(f"import storage_format: {import_time('storage_format') * 1000:8.1f} ms")
+    print()
+    print(f"{'antall':>9} {'format':>6} {'lagre':>9} {'laste':>9} {'størrelse':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in counts:
+            data = dict(enumerate(generate_quotes(count), start=1))
+            for name, save, load in formats:
+                path = Path(tmp_dir) / f"{count}.{name}"
+                save_time = timed(lambda: save(path, data))
+                load_time = timed(lambda: load(path))
+                size = path.stat().st_size
+                print(
+                    f"{count:>9} {name:>6} {save_time * 1000:7.0f}ms {load_time * 1000:7.0f}ms "
+                    f"{size / 1024 / 1024:8.2f}MiB"
+                )
+                path.unlink()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
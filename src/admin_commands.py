@@ -0,0 +1,82 @@
+"""Kommandoer for administratorene, for å se hvordan det står til med boten"""
+from result import Result, Err, Ok
+from command import Arguments, Command, Context, KwargArgument
+import metrics
+import parse_command
+import profiling
+import watchdog
+
+
+class StatsCommand(Command):
+    def __init__(self) -> None:
+        super().__init__(
+            "stats",
+            "Tid per hendelse og steg, tellere for sitatene, kommando-cachen og journalskrivingen",
+            admin_only=True,
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        sections = [metrics.summary()]
+        loop_watchdog = watchdog.get_watchdog()
+        if loop_watchdog is not None:
+            sections.append(loop_watchdog.summary())
+        # SqliteDatabase har ingen journal og dermed ingen flush_stats
+        flush_stats = getattr(context.database, "flush_stats", None)
+        if flush_stats is not None:
+            sections.append(f"Journalskriving: {flush_stats}")
+        cache = parse_command.COMMAND_CACHE
+        sections.append(f"Kommando-cache: {cache.stats} size={len(cache.entries)}/{cache.maxsize}")
+        return Ok("\n\n".join(sections))
+
+
+class ProfileStartCommand(Command):
+    def __init__(self) -> None:
+        super().__init__(
+            "start",
+            "Starter profilering (cProfile og tracemalloc)",
+            kwargs=[
+                KwargArgument(
+                    "seconds", float, "Hvor lenge opptaket varer", profiling.DEFAULT_CAPTURE_SECONDS
+                ),
+                KwargArgument("rate", float, "Andelen av kallene som blir målt (0-1)", None),
+            ],
+            admin_only=True,
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        rate = arguments["rate"]
+        if rate is not None and not 0 < rate <= 1:
+            return Err("--rate må være mellom 0 og 1")
+        if not profiling.start_capture(arguments["seconds"], rate):
+            return Err("Profilering kjører allerede. Stopp den med !profile stop")
+        return Ok(profiling.capture_status())
+
+
+class ProfileStopCommand(Command):
+    def __init__(self) -> None:
+        super().__init__(
+            "stop", "Stopper profileringen og lagrer filene. !profile viser toppen etterpå", admin_only=True
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        # pstats og tracemalloc-snapshotet lagres i en egen tråd, ikke på event-loopen
+        if not profiling.stop_capture_in_background():
+            return Err("Ingen profilering kjører")
+        return Ok("Profilering stoppet. Filene lagres nå; se !profile for toppen når de er skrevet")
+
+
+class ProfileCommand(Command):
+    def __init__(self) -> None:
+        super().__init__(
+            "profile",
+            "Profilering mens boten kjører. Uten subkommando vises status",
+            subcommands=[ProfileStartCommand(), ProfileStopCommand()],
+            admin_only=True,
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        return Ok(profiling.capture_status())
+
+
+def create_commands() -> list[Command]:
+    return [StatsCommand(), ProfileCommand()]
@@ -2,7 +2,11 @@ from __future__ import annotations
 import discord
 import datetime
 from discord.ext import tasks
-from channels import get_botchannel_by_ID, welcome_handler
+import metrics
+import profiling
+import watchdog
+from log import set_event_context
+from channels import MESSAGE, MESSAGE_DELETE, MESSAGE_EDIT, router, welcome_handler
 from database import Database
 from quote import Quote
 
@@ -10,51 +14,58 @@ from quote import Quote
 def run_bot(client: discord.Client, token: str, database: Database[Quote]):
     @client.event
     async def on_ready() -> None:
+        router.bind(client)
         weekly_quote.start()
+        await metrics.start_server()
+        watchdog.start()
 
     @client.event
     async def on_message(message: discord.Message) -> None:
-        if message.author == client.user:
-            return
+        # Kanaler uten handler blir avvist før noe annet
         channel_id = message.channel.id
-        botchannel = get_botchannel_by_ID(channel_id)
-        if botchannel is None:
-            print(channel_id)
+        handlers = router.get(MESSAGE, channel_id)
+        if len(handlers) == 0 or message.author == client.user:
             return
-        await botchannel.on_new_message(message, database)
+        set_event_context(MESSAGE, channel_id, message.id)
+        with metrics.event(MESSAGE), profiling.profile():
+            for handler in handlers:
+                await handler.on_new_message(message, database)
 
     @client.event
     async def on_message_edit(
         message_before: discord.Message, message_after: discord.Message
     ) -> None:
-        if message_before.author == client.user:
-            return
         channel_id = message_before.channel.id
-        botchannel = get_botchannel_by_ID(channel_id)
-        if botchannel is None:
-            print(channel_id)
+        handlers = router.get(MESSAGE_EDIT, channel_id)
+        if len(handlers) == 0 or message_before.author == client.user:
             return
-        await botchannel.on_edit_message(message_before, message_after, database)
+        set_event_context(MESSAGE_EDIT, channel_id, message_before.id)
+        with metrics.event(MESSAGE_EDIT), profiling.profile():
+            for handler in handlers:
+                await handler.on_edit_message(message_before, message_after, database)
 
     @client.event
     async def on_message_delete(message: discord.Message) -> None:
-        if message.author == client.user:
-            return
         channel_id = message.channel.id
-        botchannel = get_botchannel_by_ID(channel_id)
-        if botchannel is None:
-            print(channel_id)
+        handlers = router.get(MESSAGE_DELETE, channel_id)
+        if len(handlers) == 0 or message.author == client.user:
             return
-        await botchannel.on_delete_message(message, database)
+        set_event_context(MESSAGE_DELETE, channel_id, message.id)
+        with metrics.event(MESSAGE_DELETE), profiling.profile():
+            for handler in handlers:
+                await handler.on_delete_message(message, database)
 
     @client.event
     async def on_member_join(member: discord.Member) -> None:
-        await welcome_handler.on_new_member_join(member, database)
+        set_event_context("member_join")
+        with metrics.event("member_join"), profiling.profile():
+            await welcome_handler.on_new_member_join(member, database)
 
     @tasks.loop(time=datetime.time(10, tzinfo=datetime.timezone(datetime.timedelta(hours=1))))
     async def weekly_quote():
         send_day = 0
         today = datetime.datetime.now()
+        set_event_context("weekly_quote")
         server = client.guilds[0]
         if today.weekday() == send_day:
             await welcome_handler.send_weekly_quote(server, database)
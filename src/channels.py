@@ -1,12 +1,46 @@
-from typing import Optional
+from typing import Iterable
+import discord
 import message_handler
 
-welcome_handler = message_handler.WelcomeHandler()
-CHANNELS = [message_handler.QuotesHandler(), welcome_handler]
+MESSAGE = "message"
+MESSAGE_EDIT = "message_edit"
+MESSAGE_DELETE = "message_delete"
+
+Handlers = tuple[message_handler.MessageHandler, ...]
+
+
+class ChannelRouter:
+    """
+    Hendelse -> kanal-ID -> handlerne som abonnerer på hendelsen i kanalen, bygget én gang
+    ved oppstart. De fleste meldingene kommer i kanaler boten ikke bryr seg om, og de blir
+    avvist med ett dict-oppslag.
+    """
 
+    def __init__(self, handlers: Iterable[message_handler.MessageHandler]) -> None:
+        self.handlers = list(handlers)
+        self.routes: dict[str, dict[int, Handlers]] = {
+            MESSAGE: {},
+            MESSAGE_EDIT: {},
+            MESSAGE_DELETE: {},
+        }
+        for handler in self.handlers:
+            for event in handler.events:
+                routes = self.routes[event]
+                routes[handler.ID] = routes.get(handler.ID, ()) + (handler,)
 
-def get_botchannel_by_ID(ID: int) -> Optional[message_handler.MessageHandler]:
-    for channel in CHANNELS:
-        if channel.ID == ID:
-            return channel
-    return None
+    def get(self, event: str, channel_id: int) -> Handlers:
+        return self.routes[event].get(channel_id, ())
+
+    def bind(self, client: discord.Client) -> None:
+        """Slår opp kanal-objektene i klientens cache. Kalles i on_ready, som kommer på nytt etter en ny tilkobling"""
+        for handler in self.handlers:
+            handler.bind(client)
+
+
+welcome_handler = message_handler.WelcomeHandler()
+CHANNELS = [
+    message_handler.QuotesHandler(),
+    welcome_handler,
+    message_handler.QuotesInteractiveHandler(),
+]
+router = ChannelRouter(CHANNELS)
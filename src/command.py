@@ -1,64 +1,212 @@
 from __future__ import annotations
 import discord
 import parse_command as pc
-from abc import ABC
-from typing import Any, Generic, Optional, Type, Protocol, TypeAlias, TypeVar
+from abc import ABC, abstractmethod
+from typing import Any, Generic, Iterable, Optional, Type, TypeVar
 from result import Result, Err, Ok
 from dataclasses import dataclass
+from database import Database
+from quote import Quote
 
 T = TypeVar("T")
 
+Arguments = dict[str, Any]
+
 
-@dataclass
 class Command(ABC):
-    subcommands: list[Command]
-    pos_args: list[PositionalArgument]
-    flags: dict[str, FlagArgument]
-    kwargs: dict[str, KwargArgument]
-    # Initialize command with arguments in __init__()
+    """
+    En kommando med argumenter og eventuelle subkommandoer.
+    Subklasser setter opp argumentene i __init__() og gjør jobben i main().
+    Hjelpeteksten lages én gang, når kommandoen blir opprettet.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        aliases: Iterable[str] = (),
+        pos_args: Iterable[PositionalArgument] = (),
+        flags: Iterable[FlagArgument] = (),
+        kwargs: Iterable[KwargArgument] = (),
+        subcommands: Iterable[Command] = (),
+        admin_only: bool = False,
+    ) -> None:
+        self.name = name
+        self.description = description
+        # Bare brukere med administrator-rettigheter i serveren kan kjøre kommandoen
+        self.admin_only = admin_only
+        self.aliases = list(aliases)
+        self.pos_args = list(pos_args)
+        self.flags = {flag.flag_name: flag for flag in flags}
+        self.kwargs = {kwarg.key: kwarg for kwarg in kwargs}
+        self.subcommands: dict[str, Command] = {}
+        for subcommand in subcommands:
+            for name in subcommand.names():
+                self.subcommands[name] = subcommand
+        self.help = self.create_help()
+
+    def names(self) -> list[str]:
+        return [self.name, *self.aliases]
 
-    def main(self, command_tree, context: Context):
+    @abstractmethod
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        """
+        Returns:
+            Result[str, str]: Ok(svaret som skal sendes) | Err(feilmelding)
+        """
         ...
 
-    def invoke_command(self, parse_tree: pc.Tree, context: Context) -> Result[Any, str]:
+    def invoke_command(self, parse_tree: pc.Tree, context: Context) -> Result[str, str]:
+        leaves = parse_tree.leaves or []
+        # En subkommando blir tolket som første value, se parse_command
+        if len(leaves) != 0 and type(leaves[0]) == pc.Value:
+            subcommand = self.subcommands.get(leaves[0].root)
+            if subcommand is not None:
+                return subcommand.invoke_command(
+                    pc.Command(subcommand.name, leaves[1:]), context
+                )
+
         match self.initialize_arguments(parse_tree):
             case Err(err):
-                return Err(err)
-            case Ok(some):
-                pass
+                return Err(f"{err}\n\n{self.help}")
+            case Ok(arguments):
+                return self.main(arguments, context)
+
+    def initialize_arguments(self, parse_tree: pc.Tree) -> Result[Arguments, str]:
+        """Gjør om bladene i parse-treet til argumentene kommandoen har definert, med riktig type"""
+        arguments: Arguments = {flag: False for flag in self.flags}
+        for key, kwarg in self.kwargs.items():
+            arguments[key] = kwarg.default
+        values: list[str] = []
+
+        for leaf in parse_tree.leaves or []:
+            match leaf:
+                case pc.Value(root) | pc.Expr(root):
+                    values.append(root)
+                case pc.Flag(root):
+                    if root not in self.flags:
+                        return Err(f"Ukjent flagg: -{root}")
+                    arguments[root] = True
+                case pc.Kwarg(key, kwarg_leaves):
+                    kwarg = self.kwargs.get(key)
+                    if kwarg is None:
+                        return Err(f"Ukjent argument: --{key}")
+                    if not kwarg_leaves:
+                        return Err(f"--{key} mangler en verdi")
+                    match kwarg.convert(kwarg_leaves[0].root):
+                        case Err(err):
+                            return Err(err)
+                        case Ok(value):
+                            arguments[key] = value
+
+        for i, pos_arg in enumerate(self.pos_args):
+            if pos_arg.many:
+                raw_values, values = values[i:], []
+            elif i < len(values):
+                raw_values = [values[i]]
+            else:
+                raw_values = []
+
+            if len(raw_values) == 0:
+                if pos_arg.default is None and not pos_arg.many:
+                    return Err(f"Mangler argumentet {pos_arg.name}")
+                arguments[pos_arg.name] = pos_arg.default if not pos_arg.many else []
+                continue
 
-    def initialize_arguments(self, parse_tree: pc.Tree) -> Result[str, str]:
-        pass
+            converted = []
+            for raw_value in raw_values:
+                match pos_arg.convert(raw_value):
+                    case Err(err):
+                        return Err(err)
+                    case Ok(value):
+                        converted.append(value)
+            arguments[pos_arg.name] = converted if pos_arg.many else converted[0]
 
-    def create_help(self) -> None:
-        pass
+        if len(values) > len(self.pos_args):
+            extra = " ".join(values[len(self.pos_args) :])
+            return Err(f"For mange argumenter: {extra}")
+        return Ok(arguments)
 
+    def create_help(self) -> str:
+        usage = [f"!{self.name}"]
+        for pos_arg in self.pos_args:
+            name = f"{pos_arg.name}..." if pos_arg.many else pos_arg.name
+            usage.append(f"[{name}]" if pos_arg.default is not None or pos_arg.many else f"<{name}>")
+        usage.extend(f"[-{flag}]" for flag in self.flags)
+        usage.extend(f"[--{key} <{kwarg.value_type.__name__}>]" for key, kwarg in self.kwargs.items())
 
+        description = f"{self.description} (kun admin)" if self.admin_only else self.description
+        lines = [" ".join(usage), description]
+        if len(self.aliases) != 0:
+            lines.append("Alias: " + ", ".join(f"!{alias}" for alias in self.aliases))
+        for pos_arg in self.pos_args:
+            lines.append(f"    {pos_arg.name}: {pos_arg.description}")
+        for flag in self.flags.values():
+            lines.append(f"    -{flag.flag_name}: {flag.description}")
+        for kwarg in self.kwargs.values():
+            lines.append(f"    --{kwarg.key}: {kwarg.description}")
+        for name, subcommand in self.subcommands.items():
+            if name == subcommand.name:
+                lines.append(f"    {name}: {subcommand.description}")
+        return "\n".join(lines)
+
+
+@dataclass
 class Context:
-    pass
+    """Det kommandoen trenger å vite om meldingen den ble kalt fra"""
+
+    message: discord.Message
+    database: Database[Quote]
+
+    def is_admin(self) -> bool:
+        # DM-er har ingen guild_permissions
+        permissions = getattr(self.message.author, "guild_permissions", None)
+        return permissions is not None and permissions.administrator
 
 
 class Argument(Generic[T]):
     def __init__(self, value_type: Type[T], default: Optional[T]) -> None:
-        if default is not None and isinstance(default, value_type):
+        self.value_type = value_type
+        if default is not None and not isinstance(default, value_type):
             raise ValueError(
                 f"Default kan ikke være {default}, med type {type(default).__name__}. Den skal være av type {value_type}"
             )
 
+    def convert(self, raw_value: str) -> Result[T, str]:
+        value_type: Type[Any] = self.value_type
+        if value_type == bool:
+            if raw_value.lower() in ("true", "ja", "1"):
+                return Ok(True)
+            if raw_value.lower() in ("false", "nei", "0"):
+                return Ok(False)
+        else:
+            try:
+                return Ok(value_type(raw_value))
+            except (TypeError, ValueError):
+                pass
+        return Err(f"{raw_value} er ikke av typen {value_type.__name__}")
+
 
 class PositionalArgument(Argument, Generic[T]):
     def __init__(
-        self, name: str, value_type: Type[T], description: str, default: Optional[T]
+        self,
+        name: str,
+        value_type: Type[T],
+        description: str,
+        default: Optional[T],
+        many: bool = False,
     ) -> None:
         super().__init__(value_type, default)
         self.name = name
-        self.value_type = value_type
         self.description = description
         self.default = default
+        # Tar med resten av argumentene som en liste. Kan bare være det siste argumentet
+        self.many = many
 
 
 class FlagArgument(Argument, Generic[T]):
     def __init__(self, flag_name: str, description: str) -> None:
+        super().__init__(bool, None)
         self.flag_name = flag_name
         self.description = description
 
@@ -69,6 +217,70 @@ class KwargArgument(Argument, Generic[T]):
     ) -> None:
         super().__init__(value_type, default)
         self.key = key
-        self.value_type = value_type
         self.description = description
         self.default = default
+
+
+class CommandTable:
+    """
+    Navn og alias -> kommando for én kanal, bygget én gang ved oppstart.
+    Å finne kommandoen til en melding er én parsing og ett dict-oppslag.
+    """
+
+    def __init__(self, commands: Iterable[Command]) -> None:
+        self.commands: list[Command] = []
+        self.table: dict[str, Command] = {}
+        for command in commands:
+            self.add(command)
+
+    def add(self, command: Command) -> None:
+        for name in command.names():
+            if name in self.table:
+                raise ValueError(f"To kommandoer heter {name}")
+            self.table[name] = command
+        self.commands.append(command)
+
+    def get(self, name: str) -> Optional[Command]:
+        return self.table.get(name)
+
+    def dispatch(self, command_string: str, context: Context) -> Result[str, str]:
+        """command_string er meldingen uten prefikset (!)"""
+        match pc.cached_command_parser(command_string):
+            case Err(err):
+                return Err(err)
+            case Ok((None, _)):
+                return Err(f"Fant ingen kommando i {command_string}")
+            case Ok((tree, tail)) if tree is not None:
+                pass
+            case _:
+                return Err(f"Fant ingen kommando i {command_string}")
+
+        command = self.table.get(tree.root)
+        if command is None:
+            return Err(f"Ukjent kommando: {tree.root}. Skriv !help for å se kommandoene")
+        if command.admin_only and not context.is_admin():
+            return Err(f"!{command.name} er bare for administratorer")
+        if tail.strip() != "":
+            return Err(
+                f"Klarte ikke å tolke {tail.strip()}. Bruk hermetegn rundt tekst med mellomrom eller tegnsetting"
+            )
+        return command.invoke_command(tree, context)
+
+
+class HelpCommand(Command):
+    def __init__(self, table: CommandTable) -> None:
+        self.table = table
+        super().__init__(
+            "help",
+            "Viser kommandoene i kanalen, eller hjelpeteksten til én kommando",
+            pos_args=[PositionalArgument("command", str, "Kommandoen du vil vite mer om", "")],
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        name = arguments["command"]
+        if name == "":
+            return Ok("\n\n".join(command.help for command in self.table.commands))
+        command = self.table.get(name)
+        if command is None:
+            return Err(f"Ukjent kommando: {name}")
+        return Ok(command.help)
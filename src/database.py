@@ -1,33 +1,306 @@
-import dill
+import asyncio
 import math
-import random
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Optional, TypeVar, Generic
+from typing import Any, BinaryIO, Iterator, Optional, TypeVar, Generic
 from result import Result, Err, Ok
 from error import BaseError, create_error
-from output import log_error
+from log import log_error, log_event
+import metrics
+import profiling
+from quote import Fingerprint, quote_fingerprint
+from deck import ShuffleDeck
+from index import Index
+from name_index import NameIndex
+from sampling import SamplingIndex
+from search import SearchIndex
+import storage_format
 
 T = TypeVar("T")
 
+# Journalen slås sammen med snapshotet når den blir større enn dette (bytes)
+COMPACTION_THRESHOLD = 1024 * 1024
+
+SET = "set"
+POP = "pop"
+# Sist tildelte sitat-ID. Skrives først i hver nye journal, siden snapshotet bare inneholder sitatene
+ID = "id"
+
+
+class MessageIdIndex(Index[Any]):
+    """Discord message_id -> IDene til sitatene som ble laget av meldingen"""
+
+    def __init__(self) -> None:
+        self.message_ids: dict[int, set[int]] = {}
+
+    def clear(self) -> None:
+        self.message_ids.clear()
+
+    def add(self, key: int, value: Any) -> None:
+        self.message_ids.setdefault(value.message_id, set()).add(key)
+
+    def remove(self, key: int, value: Any) -> None:
+        keys = self.message_ids.get(value.message_id)
+        if keys is None:
+            return
+        keys.discard(key)
+        if len(keys) == 0:
+            del self.message_ids[value.message_id]
+
+    def get(self, message_id: int) -> set[int]:
+        return set(self.message_ids.get(message_id, ()))
+
+
+class ContentIndex(Index[Any]):
+    """quote_fingerprint -> IDene til sitatene med det innholdet"""
+
+    def __init__(self) -> None:
+        self.fingerprints: dict[Fingerprint, set[int]] = {}
+
+    def clear(self) -> None:
+        self.fingerprints.clear()
+
+    def add(self, key: int, value: Any) -> None:
+        self.fingerprints.setdefault(quote_fingerprint(value), set()).add(key)
+
+    def remove(self, key: int, value: Any) -> None:
+        fingerprint = quote_fingerprint(value)
+        keys = self.fingerprints.get(fingerprint)
+        if keys is None:
+            return
+        keys.discard(key)
+        if len(keys) == 0:
+            del self.fingerprints[fingerprint]
+
+    def get(self, value: Any) -> set[int]:
+        return set(self.fingerprints.get(quote_fingerprint(value), ()))
+
+
+# Filene som hører til et snapshot, som endelser på navnet
+SNAPSHOT_SUFFIXES = ["", ".journal", ".journal.old", ".deck", ".dill.bak"]
+
+
+def rename_legacy_files(old_path: Path, new_path: Path) -> None:
+    """Flytter snapshotet (med journal, kortstokk og backup) fra det gamle navnet, f.eks.
+    .database.pkl fra da snapshotet var en dill-fil. Gjør ingenting hvis new_path finnes.
+    Innholdet blir ikke endret; en gammel dill-fil blir konvertert når Database laster den.
+    """
+    if new_path.exists() or not old_path.is_file():
+        return
+    for suffix in SNAPSHOT_SUFFIXES:
+        old_file = old_path.with_name(old_path.name + suffix)
+        if old_file.is_file():
+            os.replace(old_file, new_path.with_name(new_path.name + suffix))
+
+
+@dataclass
+class FlushStats:
+    """Hvor mye write-behind slår sammen, og hvor lenge endringer venter før de lagres"""
+
+    flushes: int = 0
+    records: int = 0
+    largest_batch: int = 0
+    unflushed: int = 0
+    last_window_ms: float = 0.0
+    max_window_ms: float = 0.0
+
+    def __str__(self) -> str:
+        average = self.records / self.flushes if self.flushes != 0 else 0.0
+        return (
+            f"flushes={self.flushes} records={self.records} average_batch={average:.1f} "
+            f"largest_batch={self.largest_batch} unflushed={self.unflushed} "
+            f"last_window={self.last_window_ms:.0f}ms max_window={self.max_window_ms:.0f}ms"
+        )
+
 
 class Database(Generic[T]):
-    def __init__(self, database_file_path: Path, ID_path: Path) -> None:
+    """
+    Snapshot + journal, begge i JSON-linje-formatet fra storage_format.
+    Snapshotet (database_file_path) har ett sitat per linje.
+    Hver endring blir lagt til som en liten post i journalen (<database_file_path>.journal),
+    og ved oppstart blir snapshotet lest inn før journalen spilles av på toppen.
+    Når journalen blir større enn compaction_threshold, skrives et nytt snapshot i bakgrunnen.
+    Gamle dill-filer blir konvertert til det nye formatet første gang de lastes.
+
+    Med flush_interval_ms satt (write-behind) blir endringene samlet opp i minnet og skrevet
+    til journalen høyst hvert flush_interval_ms millisekund, eller når flush_after endringer venter.
+    Endringer som ikke er skrevet ennå går tapt ved et krasj; close() skriver alltid resten.
+    """
+
+    def __init__(
+        self,
+        database_file_path: Path,
+        ID_path: Path,
+        compaction_threshold: int = COMPACTION_THRESHOLD,
+        flush_interval_ms: Optional[int] = None,
+        flush_after: int = 100,
+    ) -> None:
         self.CONTACT_PERSON = "Thorbjørn Djupvik"
         if not database_file_path.is_file():
             database_file_path.touch()
-        if not ID_path.is_file():
-            ID_path.touch()
 
         self.file_path = database_file_path
         self.ID_path = ID_path
+        self.journal_path = database_file_path.with_name(
+            database_file_path.name + ".journal"
+        )
+        # Journalen som blir slått sammen med snapshotet mens kompakteringen pågår
+        self.old_journal_path = database_file_path.with_name(
+            database_file_path.name + ".journal.old"
+        )
+        self.compaction_threshold = compaction_threshold
+        self._journal_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        # Satt mens en transaksjon pågår: journalposter, angre-logg og ID-telleren ved start
+        self._transaction: Optional[list[tuple[Any, ...]]] = None
+        self._undo: list[tuple[int, Optional[T]]] = []
+        self._transaction_start_ID = 0
+        # Holdes mens en transaksjon endrer data, så skrivetråden i AsyncDatabase
+        # ikke tar snapshot midt i en transaksjon
+        self._data_lock = threading.RLock()
+
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_after = flush_after
+        self.flush_stats = FlushStats()
+        self._unflushed: list[tuple[Any, ...]] = []
+        self._dirty_since = 0.0
+        self._flush_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+
+        self.last_ID = 0
+        self.convert_legacy_pickle()
         data = self.load_data()
         if type(data) != dict:
-            raise Exception(f"Data needs to be of type {dict} not {type(self.data)}")
+            raise Exception(f"Data needs to be of type {dict} not {type(data)}")
         self.data = data
+        # ID-telleren holdes i minnet. Den gamle .ID-filen leses bare her,
+        # og hvis den mangler eller er utdatert brukes største nøkkel
+        self.last_ID = max(self.last_ID, max(self.data.keys(), default=0))
+        if ID_path.is_file():
+            match self.load_ID():
+                case Ok(ID_value):
+                    self.last_ID = max(self.last_ID, ID_value)
+                case Err(err):
+                    log_error(Exception(err.msg))
+        self.replay_journal(self.old_journal_path)
+        self.replay_journal(self.journal_path)
+
+        self.message_index = MessageIdIndex()
+        self.content_index = ContentIndex()
+        self.search_index = SearchIndex()
+        self.name_index = NameIndex()
+        self.sampling_index = SamplingIndex()
+        self.deck = ShuffleDeck(
+            database_file_path.with_name(database_file_path.name + ".deck")
+        )
+        self.indexes: list[Index[T]] = []
+        self.add_index(self.message_index)
+        self.add_index(self.content_index)
+        self.add_index(self.search_index)
+        self.add_index(self.name_index)
+        self.add_index(self.sampling_index)
+        self.add_index(self.deck)
+
+        self._journal_file: BinaryIO = open(self.journal_path, "ab")
+        self.journal_size = self._journal_file.tell()
+        if self.journal_size == 0:
+            self._write_journal(storage_format.journal_header())
+        if self.old_journal_path.is_file() or self.journal_size >= self.compaction_threshold:
+            self.compact()
+
+    def add_index(self, index: Index[T]) -> None:
+        index.rebuild(self.data.items())
+        self.indexes.append(index)
 
     def set_value(self, key: int, value: T) -> None:
+        # En endring utenfor en transaksjon er sin egen transaksjon, så den også kan rulles tilbake
+        with self.transaction():
+            self._remember_old_value(key)
+            self._set(key, value)
+            self._transaction.append((SET, key, value))  # type: ignore[union-attr]
+
+    def _set(self, key: int, value: T) -> None:
+        old_value = self.data.get(key)
+        if old_value is not None:
+            for index in self.indexes:
+                index.remove(key, old_value)
         self.data[key] = value
-        self.save_data()
+        for index in self.indexes:
+            index.add(key, value)
+
+    def _pop(self, key: int) -> T:
+        value = self.data.pop(key)
+        for index in self.indexes:
+            index.remove(key, value)
+        return value
+
+    def _remember_old_value(self, key: int) -> None:
+        self._undo.append((key, self.data.get(key)))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Samler alle endringene i blokken til én journalskriving (og én fsync).
+
+        Hvis blokken eller skrivingen feiler, blir alle endringene rullet tilbake i minnet
+        og unntaket kastet videre. En transaksjon inni en annen blir en del av den ytre.
+        """
+        if self._transaction is not None:
+            yield
+            return
+
+        with self._data_lock:
+            self._transaction = []
+            self._transaction_start_ID = self.last_ID
+            try:
+                yield
+                if len(self._transaction) != 0:
+                    self._persist(self._transaction)
+            except BaseException:
+                self._rollback()
+                raise
+            finally:
+                self._transaction = None
+                self._undo = []
+
+    def _rollback(self) -> None:
+        self.last_ID = self._transaction_start_ID
+        for key, old_value in reversed(self._undo):
+            if old_value is None:
+                if key in self.data:
+                    self._pop(key)
+            else:
+                self._set(key, old_value)
+
+    def get_by_message_id(self, message_id: int) -> set[int]:
+        """IDene til alle sitatene som ble laget av meldingen"""
+        return self.message_index.get(message_id)
+
+    def get_by_content(self, value: T) -> set[int]:
+        """IDene til alle sitatene med samme innhold (quote_fingerprint) som value"""
+        return self.content_index.get(value)
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, T]]:
+        """Sitatene som passer best med søket, best først. Se search.parse_query"""
+        return [(key, self.data[key]) for key in self.search_index.search(query, limit)]
+
+    def get_by_speaker(self, name: str) -> set[int]:
+        """IDene til sitatene der avsenderen heter (omtrent) name"""
+        return self.name_index.by_speaker(name)
+
+    def get_by_audience(self, name: str) -> set[int]:
+        """IDene til sitatene der name (omtrent) er i publikum"""
+        return self.name_index.by_audience(name)
+
+    def similar_names(self, name: str) -> list[str]:
+        """Navn i databasen som ligner på name, men er skrevet annerledes"""
+        return self.name_index.near_misses(name)
 
     def get(self, key: int) -> Optional[T]:
         return self.data.get(key)
@@ -42,28 +315,231 @@ class Database(Generic[T]):
         return [key for key in self.data.keys()]
 
     def pop(self, key: int) -> T:
-        value = self.data.pop(key)
-        self.save_data()
+        with self.transaction():
+            self._remember_old_value(key)
+            value = self._pop(key)
+            self._transaction.append((POP, key))  # type: ignore[union-attr]
         return value
 
     def load_data(self) -> Optional[dict[int, T]]:
+        """Leser snapshotet og setter last_ID fra headeren"""
         with open(self.file_path, "rb") as db_file:
             try:
-                return dill.load(db_file)
-            except EOFError:
-                self.data = {}
-                self.save_data()
-                return self.load_data()
+                data, last_ID = storage_format.read_snapshot(db_file)
             except Exception as err:
                 log_error(err)
+                return
+        self.last_ID = max(self.last_ID, last_ID)
+        return data
 
     def save_data(self) -> None:
+        self.write_snapshot(self.data, self.last_ID)
+
+    def write_snapshot(self, data: dict[int, T], last_ID: int) -> None:
+        """Skriver snapshotet til en midlertidig fil og bytter den inn atomisk"""
+        tmp_path = self.file_path.with_name(self.file_path.name + ".tmp")
+        try:
+            with metrics.stage("snapshot"), profiling.profile(), open(tmp_path, "wb") as db_file:
+                storage_format.write_snapshot(db_file, data, last_ID)
+                db_file.flush()
+                os.fsync(db_file.fileno())
+            os.replace(tmp_path, self.file_path)
+        except Exception as err:
+            log_error(err)
+            raise
+
+    def convert_legacy_pickle(self) -> None:
+        """Konverterer en gammel dill-database (snapshot + journaler) til det nye formatet.
+        Det gamle snapshotet blir liggende som <database_file_path>.dill.bak.
+        """
+        legacy_paths = [self.file_path, self.old_journal_path, self.journal_path]
+        if not any(storage_format.is_legacy_pickle(path) for path in legacy_paths):
+            return
+
+        data, last_ID = storage_format.load_legacy_pickle(self.file_path)
+        last_ID = max(last_ID, max(data.keys(), default=0))
+        backup_path = self.file_path.with_name(self.file_path.name + ".dill.bak")
+        if self.file_path.stat().st_size != 0:
+            shutil.copyfile(self.file_path, backup_path)
+        self.write_snapshot(data, last_ID)
+        self.old_journal_path.unlink(missing_ok=True)
+        self.journal_path.unlink(missing_ok=True)
+
+    def replay_journal(self, journal_path: Path) -> None:
+        """Spiller av journalen på toppen av self.data.
+        En halvskrevet post på slutten (krasj under skriving) blir kuttet bort.
+        """
+        if not journal_path.is_file():
+            return
+        with open(journal_path, "r+b") as journal:
+            valid_length = 0
+            for record, valid_length in storage_format.read_journal(journal):
+                self.apply_record(record)
+            if valid_length != journal.seek(0, os.SEEK_END):
+                log_error(
+                    Exception(f"Ødelagt post i {journal_path}"),
+                    f"Kutter etter byte {valid_length}",
+                )
+            journal.truncate(valid_length)
+        if valid_length == 0:
+            # Ikke engang headeren ble skrevet ferdig
+            journal_path.unlink()
+
+    def apply_record(self, record: tuple[Any, ...]) -> None:
+        match record:
+            case ("set", key, value):
+                self.data[key] = value
+                self.last_ID = max(self.last_ID, key)
+            case ("pop", key):
+                self.data.pop(key, None)
+            case ("id", ID_value):
+                self.last_ID = max(self.last_ID, ID_value)
+            case _:
+                raise ValueError(f"Ukjent journalpost: {record}")
+
+    def append_to_journal(self, records: list[tuple[Any, ...]]) -> None:
+        self._write_records(records)
+        self._compact_if_needed()
+
+    def _write_records(self, records: list[tuple[Any, ...]]) -> None:
+        with profiling.profile():
+            payload = b"".join(storage_format.encode_record(record) for record in records)
+            with self._journal_lock:
+                self._write_journal(payload)
+
+    def _compact_if_needed(self) -> None:
+        if self.journal_size >= self.compaction_threshold:
+            self.compact()
+
+    def _persist(self, records: list[tuple[Any, ...]]) -> None:
+        if self.flush_interval_ms is None:
+            self.append_to_journal(records)
+            self._update_flush_stats(len(records), 0.0)
+            return
+
+        with self._flush_lock:
+            if len(self._unflushed) == 0:
+                self._dirty_since = time.monotonic()
+            self._unflushed.extend(records)
+            self.flush_stats.unflushed = len(self._unflushed)
+            if len(self._unflushed) < self.flush_after:
+                self._start_flush_timer()
+                return
+        self.flush()
+
+    def _start_flush_timer(self) -> None:
+        """Må kalles med _flush_lock"""
+        if self._flush_timer is None and self.flush_interval_ms is not None:
+            self._flush_timer = threading.Timer(
+                self.flush_interval_ms / 1000, self._flush_from_timer
+            )
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Skriver alle endringer som venter (write-behind) til journalen"""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            records, self._unflushed = self._unflushed, []
+            if len(records) == 0:
+                return
+            try:
+                self.append_to_journal(records)
+            except Exception:
+                # Prøver igjen ved neste flush
+                self._unflushed = records + self._unflushed
+                raise
+            window_ms = (time.monotonic() - self._dirty_since) * 1000
+            self._update_flush_stats(len(records), window_ms)
+
+    def _flush_from_timer(self) -> None:
         try:
-            with open(self.file_path, "wb") as db_file:
-                dill.dump(self.data, db_file)
+            self.flush()
         except Exception as err:
             log_error(err)
 
+    def _update_flush_stats(self, batch_size: int, window_ms: float) -> None:
+        stats = self.flush_stats
+        stats.flushes += 1
+        stats.records += batch_size
+        stats.largest_batch = max(stats.largest_batch, batch_size)
+        stats.unflushed = len(self._unflushed)
+        stats.last_window_ms = window_ms
+        stats.max_window_ms = max(stats.max_window_ms, window_ms)
+
+    def _write_journal(self, payload: bytes) -> None:
+        """Må kalles med _journal_lock"""
+        self._journal_file.write(payload)
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+        self.journal_size += len(payload)
+
+    def compact(self) -> None:
+        """Slår sammen journalen med snapshotet i en bakgrunnstråd.
+
+        Journalen blir rotert til .journal.old og en ny, tom journal blir åpnet,
+        slik at nye endringer kan skrives mens snapshotet skrives.
+        Avspilling er idempotent, så et krasj underveis mister ingen data.
+        """
+        with self._journal_lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            snapshot = self._compaction_snapshot()
+            snapshot_last_ID = self.last_ID
+            self._journal_file.close()
+            if self.old_journal_path.is_file():
+                # En tidligere kompaktering feilet; behold den gamle journalen
+                with open(self.old_journal_path, "ab") as old_journal, open(
+                    self.journal_path, "rb"
+                ) as journal:
+                    # Den gamle journalen har allerede en header
+                    journal.readline()
+                    old_journal.write(journal.read())
+                self.journal_path.unlink()
+            else:
+                os.replace(self.journal_path, self.old_journal_path)
+            self._journal_file = open(self.journal_path, "ab")
+            self.journal_size = 0
+            self._write_journal(
+                storage_format.journal_header()
+                + storage_format.encode_record((ID, self.last_ID))
+            )
+
+            self._compaction_thread = threading.Thread(
+                target=self._write_compacted_snapshot,
+                args=(snapshot, snapshot_last_ID),
+                name="database-compaction",
+            )
+            self._compaction_thread.start()
+
+    def _compaction_snapshot(self) -> dict[int, T]:
+        return dict(self.data)
+
+    def _write_compacted_snapshot(self, snapshot: dict[int, T], last_ID: int) -> None:
+        try:
+            self.write_snapshot(snapshot, last_ID)
+        except Exception:
+            return
+        self.old_journal_path.unlink(missing_ok=True)
+
+    async def commit(self) -> None:
+        """Venter til alle endringer så langt er skrevet til disk.
+        Database skriver synkront, så her er alt allerede skrevet.
+        """
+
+    def close(self) -> None:
+        """Skriver endringer som venter, venter på en eventuell kompaktering og lukker journalen"""
+        self.flush()
+        if self.flush_stats.flushes != 0:
+            log_event("Journalskriving", **asdict(self.flush_stats))
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._journal_lock:
+            self._journal_file.close()
+        self.deck.close()
+
     def load_ID(self) -> Result[int, BaseError]:
         if Path.is_file(self.ID_path):
             try:
@@ -84,33 +560,237 @@ class Database(Generic[T]):
                 return create_error(str(err))
         return create_error(f"Filen eksisterer ikke: {self.ID_path.absolute()}")
 
-    def save_ID(self, ID: int) -> Result[None, BaseError]:
-        try:
-            with open(self.ID_path, "w") as file:
-                file.write(str(ID))
-        except Exception as err:
-            return create_error(str(err))
-        return Ok(None)
-
     def create_new_quote_ID(self) -> Result[int, BaseError]:
         """Genererer sitat-ID
 
+        Telleren ligger i minnet og blir lagret implisitt gjennom journalposten
+        til sitatet som får IDen, så dette gjør ingen filoperasjoner.
+
         Returns:
             Result[int, str]: Ok(sitat-ID) | Err(Feilmelding)
         """
-        match self.load_ID():
-            case Ok(ID_value):
-                ID = ID_value + 1
-            case Err(err):
-                return Err(err)
+        self.last_ID += 1
+        return Ok(self.last_ID)
+
+    def get_random_element(self, weighted: bool = False) -> Optional[T]:
+        """Et tilfeldig sitat i O(1).
+        Med weighted=True foretrekkes sitat som har blitt trukket sjelden før (O(log n)).
+        """
+        if weighted:
+            key = self.sampling_index.weighted_random_key()
+        else:
+            key = self.sampling_index.random_key()
+        if key is None:
+            return
+        return self.data[key]
+
+    def draw_from_deck(self) -> Optional[T]:
+        """Neste sitat fra kortstokken: ingen sitat blir vist to ganger før alle er vist"""
+        key = self.deck.draw()
+        if key is None:
+            return
+        return self.data[key]
+
+
+@dataclass
+class PendingWrite(Generic[T]):
+    """En journalskriving i AsyncDatabase, og hvordan transaksjonen angres hvis den feiler"""
+
+    future: Future[None]
+    undo: list[tuple[int, Optional[T], Optional[T]]]
+
+
+def _current_task() -> Optional[asyncio.Task[Any]]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+
+class AsyncDatabase(Database[T]):
+    """
+    Database der journalskrivingen (og dermed kompakteringen) skjer i en egen skrivetråd,
+    slik at event-loopen aldri venter på disken.
+    Endringene er synlige i minnet med en gang; `await commit()` venter til de er lagret.
+    Skrivetråden er én enkelt tråd, så endringene blir skrevet i samme rekkefølge som de ble gjort.
+    """
+
+    def __init__(
+        self,
+        database_file_path: Path,
+        ID_path: Path,
+        compaction_threshold: int = COMPACTION_THRESHOLD,
+        flush_interval_ms: Optional[int] = None,
+        flush_after: int = 100,
+    ) -> None:
+        # Skrivinger som feilet og ikke er rullet tilbake ennå. Kompakteringen venter til de er det
+        self._failed_writes = 0
+        # Etter close() skrives det som er igjen i kallende tråd
+        self._writer_closed = False
+        # Angre-loggene til skrivingene som er sendt til skrivetråden men ikke ferdige, eldste først.
+        # Endres bare med _data_lock
+        self._queued: deque[list[tuple[int, Optional[T], Optional[T]]]] = deque()
+        super().__init__(
+            database_file_path,
+            ID_path,
+            compaction_threshold,
+            flush_interval_ms,
+            flush_after,
+        )
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="database-writer"
+        )
+        # Skrivingene som ikke er bekreftet med commit() ennå, per task (None utenfor event-loopen)
+        self._pending_writes: dict[Optional[asyncio.Task[Any]], list[PendingWrite[T]]] = {}
+
+    def append_to_journal(self, records: list[tuple[Any, ...]]) -> None:
+        if self._writer_closed:
+            super().append_to_journal(records)
+            return
+        if self.flush_interval_ms is not None:
+            # Kalles bare fra Database.flush i skrivetråden, med _flush_lock.
+            # _flush_in_writer kompakterer etter at låsen er sluppet
+            self._write_records(records)
+            return
+        undo = self._undo_entries() if self._transaction is not None else []
+        self._queued.append(undo)
+        task = _current_task()
+        if task is None:
+            # Ingen task kommer til å kalle commit(), så skrivetråden tar seg av feilen selv
+            self._writer.submit(self._append_untracked, records, undo)
+            return
+        write = self._writer.submit(self._append_in_writer, records)
+        self._pending_writes.setdefault(task, []).append(PendingWrite(write, undo))
+
+    def flush(self) -> None:
+        """Skriver endringene som venter (write-behind) i skrivetråden.
+        Feiler skrivingen, blir de lagt tilbake først i køen og prøvd igjen ved neste flush.
+        """
+        if self._writer_closed:
+            super().flush()
+            return
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if len(self._unflushed) == 0:
+                return
+        self._writer.submit(self._flush_in_writer)
 
-        match self.save_ID(ID):
-            case Err(err):
-                return Err(err)
+    def _flush_in_writer(self) -> None:
+        try:
+            super().flush()
+        except Exception as err:
+            log_error(err, "Prøver igjen ved neste flush")
+            with self._flush_lock:
+                self._start_flush_timer()
+        self._compact_if_needed()
 
-        return Ok(ID)
+    def _append_untracked(
+        self, records: list[tuple[Any, ...]], undo: list[tuple[int, Optional[T], Optional[T]]]
+    ) -> None:
+        try:
+            self._write_records(records)
+        except Exception as err:
+            log_error(err, "Endringen ble ikke lagret og er rullet tilbake")
+            with self._data_lock:
+                self._queued.popleft()
+                self._revert(undo)
+            return
+        with self._data_lock:
+            self._queued.popleft()
+        self._compact_if_needed()
+
+    def _undo_entries(self) -> list[tuple[int, Optional[T], Optional[T]]]:
+        """(nøkkel, verdi før, verdi etter) for hver nøkkel transaksjonen endret"""
+        old_values: dict[int, Optional[T]] = {}
+        for key, old_value in self._undo:
+            old_values.setdefault(key, old_value)
+        return [(key, old_value, self.data.get(key)) for key, old_value in old_values.items()]
+
+    def _append_in_writer(self, records: list[tuple[Any, ...]]) -> None:
+        try:
+            self._write_records(records)
+        except BaseException:
+            with self._data_lock:
+                self._queued.popleft()
+                self._failed_writes += 1
+            raise
+        with self._data_lock:
+            self._queued.popleft()
+        self._compact_if_needed()
 
-    def get_random_element(self) -> Optional[T]:
-        if len(self.data) == 0:
+    def compact(self) -> None:
+        # Et snapshot nå kunne fått med endringer som ikke ble lagret og ennå ikke er rullet tilbake
+        if self._failed_writes != 0:
             return
-        return random.choice(list(self.data.values()))
+        super().compact()
+
+    def _compaction_snapshot(self) -> dict[int, T]:
+        """Tilstanden etter siste vellykkede journalskriving: data, uten transaksjonene som
+        fortsatt står i kø hos skrivetråden. Feiler en av dem senere, er den ikke med i snapshotet.
+        """
+        with self._data_lock:
+            snapshot = dict(self.data)
+            for undo in reversed(self._queued):
+                for key, old_value, _ in undo:
+                    if old_value is None:
+                        snapshot.pop(key, None)
+                    else:
+                        snapshot[key] = old_value
+        return snapshot
+
+    async def commit(self) -> None:
+        """Venter til endringene denne tasken (hendelsen) har gjort er skrevet til disk.
+        Hvis en av skrivingene feilet, blir transaksjonen den hørte til rullet tilbake i minnet
+        og unntaket kastet.
+        """
+        task = _current_task()
+        pending_writes = self._pending_writes.pop(task, [])
+        errors: list[BaseException] = []
+        for write in pending_writes:
+            try:
+                await asyncio.wrap_future(write.future)
+            except Exception as err:
+                log_error(err)
+                errors.append(err)
+                self._undo_failed_write(write)
+        self._forget_finished_writes()
+        if len(errors) != 0:
+            raise errors[0]
+
+    def _undo_failed_write(self, write: PendingWrite[T]) -> None:
+        with self._data_lock:
+            self._revert(write.undo)
+            self._failed_writes -= 1
+
+    def _revert(self, undo: list[tuple[int, Optional[T], Optional[T]]]) -> None:
+        """Må kalles med _data_lock"""
+        for key, old_value, new_value in undo:
+            # Bare hvis ingen senere endring har overskrevet verdien
+            if self.data.get(key) is not new_value:
+                continue
+            if old_value is None:
+                self._pop(key)
+            else:
+                self._set(key, old_value)
+
+    def _forget_finished_writes(self) -> None:
+        """Glemmer tasker som aldri kalte commit(), når alle skrivingene deres gikk bra"""
+        for task, writes in list(self._pending_writes.items()):
+            if all(write.future.done() and write.future.exception() is None for write in writes):
+                del self._pending_writes[task]
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self._writer_closed = True
+        for writes in self._pending_writes.values():
+            for write in writes:
+                err = write.future.exception()
+                if err is not None:
+                    log_error(err, "Endringen ble ikke lagret og er fortsatt bare i minnet")
+        self._pending_writes = {}
+        super().close()
+
@@ -0,0 +1,111 @@
+"""
+Kortstokk for ukens sitat og velkomstmeldinger: alle sitatene blir vist én gang
+før noe blir vist på nytt.
+
+I stedet for å lagre en hel stokket rekkefølge trekkes det uniformt fra sitatene som
+ikke er vist i denne runden (tett liste med swap-remove, O(1)). Det gir samme fordeling
+som en stokket kortstokk, og nye sitat kan legges inn midt i runden uten å stokke om.
+På disk ligger bare IDene som er trukket i denne runden, én linje per trekk.
+"""
+from __future__ import annotations
+import os
+import random
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+from index import Index
+from log import log_error
+import storage_format
+
+
+class ShuffleDeck(Index[Any]):
+    def __init__(self, path: Path, rng: Optional[random.Random] = None) -> None:
+        self.path = path
+        self.rng = rng if rng is not None else random.Random()
+        self.cycle = 0
+        # Trukket i denne runden. Kan inneholde slettede sitat, IDer blir aldri gjenbrukt
+        self.drawn: set[int] = set()
+        self.keys: set[int] = set()
+        self.remaining: list[int] = []
+        self.positions: dict[int, int] = {}
+        self.load()
+        self._file: BinaryIO = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(storage_format.encode_header(storage_format.DECK, cycle=self.cycle))
+            self._file.flush()
+
+    def load(self) -> None:
+        if not self.path.is_file():
+            return
+        with open(self.path, "rb") as file:
+            try:
+                header = storage_format.decode_header(file.readline(), storage_format.DECK)
+            except storage_format.FormatError as err:
+                log_error(err, f"Starter en ny runde i {self.path}")
+                self.path.unlink()
+                return
+            self.cycle = header.get("cycle", 0)
+            for line in file:
+                # En halvskrevet linje på slutten betyr bare at det siste trekket ikke ble lagret
+                if line.endswith(b"\n") and line.strip().isdigit():
+                    self.drawn.add(int(line))
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.remaining.clear()
+        self.positions.clear()
+
+    def add(self, key: int, value: Any) -> None:
+        self.keys.add(key)
+        if key in self.drawn or key in self.positions:
+            return
+        self.positions[key] = len(self.remaining)
+        self.remaining.append(key)
+
+    def remove(self, key: int, value: Any) -> None:
+        self.keys.discard(key)
+        position = self.positions.pop(key, None)
+        if position is None:
+            return
+        last_key = self.remaining.pop()
+        if last_key != key:
+            self.remaining[position] = last_key
+            self.positions[last_key] = position
+
+    def draw(self) -> Optional[int]:
+        """Neste sitat i kortstokken. Starter en ny runde når alle er trukket"""
+        if len(self.remaining) == 0:
+            if len(self.keys) == 0:
+                return None
+            self.new_cycle()
+        position = self.rng.randrange(len(self.remaining))
+        key = self.remaining[position]
+        self.remove(key, None)
+        self.keys.add(key)
+        self.drawn.add(key)
+        try:
+            self._file.write(f"{key}\n".encode())
+            self._file.flush()
+        except Exception as err:
+            # Verste fall er at sitatet kan bli vist én gang til etter en omstart
+            log_error(err)
+        return key
+
+    def new_cycle(self) -> None:
+        self.cycle += 1
+        self.drawn.clear()
+        for key in self.keys:
+            self.positions[key] = len(self.remaining)
+            self.remaining.append(key)
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(storage_format.encode_header(storage_format.DECK, cycle=self.cycle))
+            os.replace(tmp_path, self.path)
+            self._file.close()
+            self._file = open(self.path, "ab")
+        except Exception as err:
+            log_error(err)
+
+    def close(self) -> None:
+        self._file.close()
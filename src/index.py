@@ -0,0 +1,28 @@
+from abc import ABC, abstractmethod
+from typing import Generic, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class Index(ABC, Generic[T]):
+    """
+    Sekundærindeks som Database holder oppdatert ved set_value/pop,
+    og som bygges på nytt når databasen lastes inn.
+    """
+
+    def rebuild(self, items: Iterable[tuple[int, T]]) -> None:
+        self.clear()
+        for key, value in items:
+            self.add(key, value)
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: int, value: T) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, key: int, value: T) -> None:
+        ...
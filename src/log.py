@@ -0,0 +1,151 @@
+"""
+Logging som ikke blokkerer event-loopen.
+
+Et kall til log_error/log_event legger bare posten i en kø. En egen tråd (QueueListener)
+formatterer den som én JSON-linje og skriver den til en fil som roterer på størrelse
+(eller tid, med when="midnight" osv.). Uten setup_logging går advarsler og feil til stderr.
+
+Hver Discord-hendelse kjører i sin egen task, så set_event_context gjelder bare postene
+fra den hendelsen:
+    {"time": "...", "level": "ERROR", "message": "...", "event": "message_edit",
+     "channel": 123, "message_id": 456, "error": "OSError", "traceback": "..."}
+"""
+from __future__ import annotations
+import asyncio
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import weakref
+from pathlib import Path
+from typing import Any, Optional
+
+LOGGER_NAME = "teknobyen"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 5
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.setLevel(logging.INFO)
+
+_event_context: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar(
+    "event_context", default={}
+)
+# Samme context per task, for vakthunden som leser den fra en annen tråd
+_task_contexts: weakref.WeakKeyDictionary[asyncio.Task[Any], dict[str, Any]] = weakref.WeakKeyDictionary()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Legger posten i køen uten å formattere den først (QueueHandler.prepare gjør det i
+    kallende tråd). Tråden som skriver deler minne med oss, så exc_info kan sendes som den er.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        context = _event_context.get()
+        if len(context) != 0:
+            record.context = context
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info is not None and record.exc_info[1] is not None:
+            entry["error"] = type(record.exc_info[1]).__name__
+            entry["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(
+    path: Path,
+    max_bytes: int = MAX_BYTES,
+    backup_count: int = BACKUP_COUNT,
+    when: Optional[str] = None,
+) -> None:
+    """Starter skrivetråden. Kalles én gang ved oppstart, med en absolutt sti
+
+    Args:
+        path (Path): loggfilen, f.eks. <save_dir>/log.jsonl
+        max_bytes (int): roterer når filen blir så stor
+        backup_count (int): antall gamle filer (log.jsonl.1, ...) som blir beholdt
+        when (Optional[str]): roterer på tid i stedet, se TimedRotatingFileHandler
+    """
+    global _listener
+    shutdown_logging()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if when is not None:
+        file_handler: logging.Handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding="utf-8"
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    logger.handlers = [ContextQueueHandler(log_queue)]
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Skriver ut det som ligger i køen og stopper skrivetråden"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    logger.handlers = []
+    logger.propagate = True
+
+
+atexit.register(shutdown_logging)
+
+
+def set_event_context(event: str, channel: Optional[int] = None, message_id: Optional[int] = None) -> None:
+    """Merker alle poster fra resten av denne hendelsen (tasken) med hendelsestype, kanal og melding"""
+    context: dict[str, Any] = {"event": event}
+    if channel is not None:
+        context["channel"] = channel
+    if message_id is not None:
+        context["message_id"] = message_id
+    _event_context.set(context)
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return
+    if task is not None:
+        _task_contexts[task] = context
+
+
+def get_event_context(task: Optional[asyncio.Task[Any]] = None) -> dict[str, Any]:
+    """Hendelsen til denne tasken, eller til en annen task (også fra en annen tråd)"""
+    if task is None:
+        return _event_context.get()
+    return _task_contexts.get(task, {})
+
+
+def log_error(err: BaseException, *details: str, **fields: Any) -> None:
+    """Logger et unntak med traceback. details og fields blir egne felter i JSON-linjen"""
+    if len(details) != 0:
+        fields["details"] = list(details)
+    logger.error(str(err) or type(err).__name__, exc_info=err, extra={"fields": fields})
+
+
+def log_event(message: str, level: int = logging.INFO, **fields: Any) -> None:
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"fields": fields})
@@ -4,11 +4,16 @@ import sys
 from dotenv import load_dotenv
 load_dotenv()
 from bot import run_bot
-from database import Database
+from log import setup_logging
+import metrics
+import profiling
+import watchdog
+from database import AsyncDatabase, rename_legacy_files
+from sqlite_database import SqliteDatabase, migrate_from_pickle
 from pathlib import Path
 
 
-def main(debug: bool):
+def main(debug: bool, profile: bool = False):
     intents = discord.Intents.default()
     intents.message_content = True
     intents.members = True
@@ -22,16 +27,63 @@ def main(debug: bool):
         save_dir = Path(__file__).parent
     else:
         save_dir = Path("/persistent_database")
-    database_path = save_dir / ".database.pkl"
+    # JSON-linjer, skrevet av en egen tråd. LOG_ROTATE_WHEN=midnight roterer daglig i stedet for på størrelse
+    setup_logging(save_dir / "log.jsonl", when=os.getenv("LOG_ROTATE_WHEN"))
+    # METRICS=1 slår på målingene (se !stats), METRICS_PORT eksporterer dem også på /metrics
+    metrics_port = os.getenv("METRICS_PORT")
+    if os.getenv("METRICS") == "1" or metrics_port:
+        metrics.enable(
+            int(metrics_port) if metrics_port else None,
+            os.getenv("METRICS_HOST", "127.0.0.1"),
+        )
+    # PROFILE=1 eller --profile starter et opptak med en gang, se også !profile
+    profiling.configure(
+        save_dir / "profiles",
+        float(os.getenv("PROFILE_SAMPLE_RATE")) if os.getenv("PROFILE_SAMPLE_RATE") else None,
+    )
+    if profile or os.getenv("PROFILE") == "1":
+        # Opptaket lagres når tiden går ut, ikke først når boten avsluttes
+        seconds = os.getenv("PROFILE_SECONDS")
+        profiling.start_capture(float(seconds) if seconds else profiling.DEFAULT_CAPTURE_SECONDS)
+    # Vakthunden logger stacken når event-loopen henger lenger enn LOOP_LAG_THRESHOLD_MS
+    if os.getenv("LOOP_WATCHDOG") == "0":
+        watchdog.disable()
+    elif os.getenv("LOOP_LAG_THRESHOLD_MS"):
+        watchdog.configure(threshold=int(os.getenv("LOOP_LAG_THRESHOLD_MS", "")) / 1000)
+    database_path = save_dir / ".database.jsonl"
     id_path = save_dir / ".ID"
+    # Snapshotet het .database.pkl fra den tiden det var en dill-fil
+    rename_legacy_files(save_dir / ".database.pkl", database_path)
 
-    database = Database(database_path, id_path)
+    # DATABASE_BACKEND=sqlite bytter til SQLite-lagring. Første oppstart flytter over de gamle sitatene.
+    backend = os.getenv("DATABASE_BACKEND", "pickle")
+    if backend == "sqlite":
+        database = SqliteDatabase(save_dir / ".database.sqlite3")
+        migrate_from_pickle(database, database_path, id_path)
+    elif backend == "pickle":
+        # DATABASE_FLUSH_INTERVAL_MS slår på write-behind: endringer samles og skrives høyst så ofte
+        flush_interval_ms = os.getenv("DATABASE_FLUSH_INTERVAL_MS")
+        flush_after = os.getenv("DATABASE_FLUSH_AFTER", "100")
+        database = AsyncDatabase(
+            database_path,
+            id_path,
+            flush_interval_ms=int(flush_interval_ms) if flush_interval_ms else None,
+            flush_after=int(flush_after),
+        )
+    else:
+        raise ValueError(f"Ukjent DATABASE_BACKEND: {backend}")
 
-    run_bot(client, TOKEN, database)
+    try:
+        run_bot(client, TOKEN, database)
+    finally:
+        database.close()
+        profiling.stop_capture()
 
 
 if __name__ == "__main__":
-    args = sys.argv
+    # python main.py [debug|release] [--profile]
+    profile = "--profile" in sys.argv
+    args = [arg for arg in sys.argv if arg != "--profile"]
     if len(args) <= 1 or args[1] in ("debug", "dev"):
         debug = True
     elif args[1] in ("release", "prod"):
@@ -39,4 +91,4 @@ if __name__ == "__main__":
     else:
         print(f"{args[1:]} is not a valid argument")
         sys.exit()
-    main(debug)
+    main(debug, profile)
@@ -1,5 +1,7 @@
 from abc import ABC
+from typing import Optional
 from result import Ok, Err
+from error import BaseError
 from database import Database
 from quote import Quote
 import os
@@ -7,6 +9,9 @@ import discord
 import quote_utils
 import command as cmd
 import output
+import metrics
+import quote_commands
+import admin_commands
 
 Message = discord.Message
 COMMAND_PREFIX = "!"
@@ -17,14 +22,44 @@ class MessageHandler(ABC):
     channel: str
     ID: int
     commands = list[Command]
+    events = hendelsene handleren får fra ChannelRouter (message, message_edit, message_delete)
     """
 
     channel: str
     ID: int
     commands: list[cmd.Command]
+    events: frozenset[str] = frozenset({"message", "message_edit", "message_delete"})
 
     def __init__(self) -> None:
         self.ID = self.get_channel_ID()
+        self.channel_handle: Optional[discord.abc.Messageable] = None
+        # Bygges én gang, så en kommando er én parsing og ett oppslag
+        self.command_table = cmd.CommandTable(self.commands)
+        if len(self.commands) != 0:
+            self.command_table.add(cmd.HelpCommand(self.command_table))
+
+    async def on_command(self, message: Message, database: Database[Quote]) -> None:
+        content = message.content.strip()
+        if not content.startswith(COMMAND_PREFIX):
+            return
+        context = cmd.Context(message, database)
+        with metrics.stage("command"):
+            result = self.command_table.dispatch(content[len(COMMAND_PREFIX) :], context)
+        with metrics.stage("send"):
+            match result:
+                case Err(err):
+                    await output.send_message(err, message.channel)
+                case Ok(response):
+                    await output.send_message(response, message.channel)
+
+    def bind(self, client: discord.Client) -> None:
+        self.channel_handle = client.get_channel(self.ID)
+
+    def get_channel(self, guild: discord.Guild) -> Optional[discord.abc.Messageable]:
+        """Kanalen fra klientens cache (bind), ellers et oppslag på ID i serveren"""
+        if self.channel_handle is None:
+            self.channel_handle = guild.get_channel(self.ID)
+        return self.channel_handle
 
     def get_channel_ID(self) -> int:
         ID = os.getenv(self.channel)
@@ -54,68 +89,103 @@ class QuotesHandler(MessageHandler):
     commands = []
 
     async def on_new_message(self, message: Message, database: Database[Quote]) -> None:
-        content = message.content
-        quotes_list = []
-        match quote_utils.format_quotes(content, message.id):
-            case Err(err):
-                await output.send_message(err.msg, message.channel)
-                return
-            case Ok((quotes_list, warnings)):
-                if len(warnings) != 0:
-                    await output.send_errors(warnings, message.channel)
-
-        reciepts, errors = quote_utils.add_quotes(quotes_list, database)
-        await output.send_iterable(reciepts, message.channel)
-        await output.send_errors(errors, message.channel)
+        # Alt hendelsen svarer blir samlet og sendt til slutt, i så få meldinger som mulig
+        outbox = output.Outbox()
+        await self.add_message_quotes(message, database, outbox)
+        with metrics.stage("send"):
+            await outbox.flush()
 
     async def on_edit_message(
         self, old_message: Message, new_message: Message, database: Database[Quote]
     ) -> None:
-        # Finner IDen til alle sitatene i databasen som hører til meldingen som ble endret
-        old_quote_ids: list[int] = []
-        for id, quote in database.items():
-            if quote.message_id == old_message.id:
-                old_quote_ids.append(id)
-
-        # Sletter alle sitatene som ble laget av den gamle meldingen
-        reciepts, errors = quote_utils.remove_quotes(old_quote_ids, database)
-        await output.send_iterable(reciepts, old_message.channel)
-        await output.send_errors(errors, old_message.channel)
-
-        # Formatterer nye sitater
-        new_content = new_message.content
-        match quote_utils.format_quotes(new_content, new_message.id):
-            case Err(err):
-                await output.send_message(err.msg, new_message.channel)
-                return
-            case Ok((quotes_list, warnings)):
-                if len(warnings) != 0:
-                    await output.send_errors(warnings, new_message.channel)
-
-        # Legger til nye sitater
-        reciepts, errors = quote_utils.add_quotes(quotes_list, database)
-        await output.send_iterable(reciepts, new_message.channel)
-        await output.send_errors(errors, new_message.channel)
+        outbox = output.Outbox()
+        # Ble ikke slettingen lagret, er de gamle sitatene der fortsatt, og de nye ville kommet i tillegg
+        if await self.remove_message_quotes(old_message, database, outbox, old_message.channel):
+            # Formatterer og legger til de nye sitatene
+            await self.add_message_quotes(new_message, database, outbox)
+        with metrics.stage("send"):
+            await outbox.flush()
 
     async def on_delete_message(
         self, message: Message, database: Database[Quote]
     ) -> None:
-        # Finner IDen til alle sitatene i databasen som laget av den gamle meldingen
-        old_quote_ids: list[int] = []
-        for id, quote in database.items():
-            if quote.message_id == message.id:
-                old_quote_ids.append(id)
-
-        # Sletter alle sitatene som ble laget av den gamle meldingen
-        reciepts, errors = quote_utils.remove_quotes(old_quote_ids, database)
-        await output.send_iterable(reciepts, message.channel)
-        await output.send_errors(errors, message.author)
+        outbox = output.Outbox()
+        await self.remove_message_quotes(message, database, outbox, message.author)
+        with metrics.stage("send"):
+            await outbox.flush()
+
+    async def remove_message_quotes(
+        self,
+        message: Message,
+        database: Database[Quote],
+        outbox: output.Outbox,
+        error_channel: discord.abc.Messageable,
+    ) -> bool:
+        """Sletter alle sitatene som ble laget av meldingen
+
+        Returns:
+            bool: False hvis slettingen ikke ble lagret (og er rullet tilbake)
+        """
+        # Finner IDen til alle sitatene i databasen som hører til meldingen
+        old_quote_ids = sorted(database.get_by_message_id(message.id))
+        with metrics.stage("validate"):
+            reciepts, errors = quote_utils.remove_quotes(old_quote_ids, database)
+        return await self.commit_and_report(
+            database, outbox, reciepts, errors, "quotes_removed", message.channel, error_channel
+        )
+
+    async def add_message_quotes(
+        self, message: Message, database: Database[Quote], outbox: output.Outbox
+    ) -> None:
+        with metrics.stage("parse"):
+            formatted = quote_utils.format_quotes(message.content, message.id, database)
+        match formatted:
+            case Err(err):
+                metrics.count("messages_rejected")
+                outbox.add(err.msg, message.channel)
+                return
+            case Ok((quotes_list, warnings)):
+                outbox.add_errors(warnings, message.channel)
+
+        # Validering (format og duplikater) skjer når sitatene legges til i minnet
+        with metrics.stage("validate"):
+            reciepts, errors = quote_utils.add_quotes(quotes_list, database)
+        metrics.count("quotes_rejected", len(errors))
+        await self.commit_and_report(
+            database, outbox, reciepts, errors, "quotes_added", message.channel, message.channel
+        )
+
+    async def commit_and_report(
+        self,
+        database: Database[Quote],
+        outbox: output.Outbox,
+        reciepts: list[str],
+        errors: list[BaseError],
+        counter: str,
+        reciept_channel: discord.abc.Messageable,
+        error_channel: discord.abc.Messageable,
+    ) -> bool:
+        """Venter til endringene er lagret, og legger kvitteringene og feilene i outbox
+
+        Returns:
+            bool: False hvis lagringen feilet. Da er endringene rullet tilbake og kvitteringene forkastet
+        """
+        with metrics.stage("persist"):
+            commit_errors = await quote_utils.commit_changes(database)
+        if len(commit_errors) != 0:
+            reciepts = []
+        metrics.count(counter, len(reciepts))
+        outbox.add_iterable(reciepts, reciept_channel)
+        outbox.add_errors([*errors, *commit_errors], error_channel)
+        return len(commit_errors) == 0
 
 
 class WelcomeHandler(MessageHandler):
     channel = "welcome"
     ID: int
     commands = []
+    # Sender bare, og leser ingen meldinger fra kanalen
+    events = frozenset()
 
     # Ved testing kan funksjonen endres til on_new_message
     async def on_new_message(
@@ -126,18 +196,13 @@ class WelcomeHandler(MessageHandler):
     async def on_new_member_join(
         self, member: discord.Member, database: Database[Quote]
     ) -> None:
-        server_channels = member.guild.text_channels
-        general_channel = None
-        for channel in server_channels:
-            if channel.id == self.ID:
-                general_channel = channel
-                break
+        general_channel = self.get_channel(member.guild)
         if general_channel is None:
             return
 
         message = f"@everyone Look who it is! {member.mention} finally decided to join us here at {member.guild.name}!!\nWelcome! It is fair to say you have come to the right place!\n"
 
-        quote = database.get_random_element()
+        quote = database.draw_from_deck()
         if quote is None:
             message += "Let Thorbjørn demonstrate our greatest qualities with a quote:\n\n'*!¤%#!! Eg sletta heile databasen med velkomst-sitater!'\nThorbjørn"
         else:
@@ -145,37 +210,29 @@ class WelcomeHandler(MessageHandler):
                 f"Let {quote.speaker} demonstrate our greatest qualities with a quote:\n\n'"
             )
             message += quote_utils.present_quote(quote) + "'"
-        await output.send_message(message, general_channel)
+        with metrics.stage("send"):
+            await output.send_message(message, general_channel)
 
     async def send_weekly_quote(self, server: discord.Guild, database: Database[Quote]) -> None:
-        server_channels = server.text_channels
-        general_channel = None
-        for channel in server_channels:
-            if channel.id == self.ID:
-                general_channel = channel
-                break
+        general_channel = self.get_channel(server)
         if general_channel is None:
             return
         
-        quote = database.get_random_element()
+        quote = database.draw_from_deck()
         message = f"@everyone Here comes the weekly quote!!\n\n"
 
         if quote is None:
             message += "'*!¤%#!! Eg sletta heile databasen med sitater!'\n[Thorbjørn]"
         else:
             message += quote_utils.present_quote(quote)
-        await output.send_message(message, general_channel)
+        with metrics.stage("send"):
+            await output.send_message(message, general_channel)
 
 class QuotesInteractiveHandler(MessageHandler):
     channel = "quotes-interactive"
     ID: int
-    commands = []
-
-    async def on_new_message(self, message: Message) -> None:
-        pass
-
-    async def on_edit_message(self, old_message: Message, new_message: Message) -> None:
-        pass
+    commands = quote_commands.create_commands() + admin_commands.create_commands()
+    events = frozenset({"message"})
 
-    async def on_delete_message(self, message: Message) -> None:
-        pass
+    async def on_new_message(self, message: Message, database: Database[Quote]) -> None:
+        await self.on_command(message, database)
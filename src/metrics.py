@@ -0,0 +1,223 @@
+"""
+Tidsmålinger og tellere for hendelsene, eksportert i Prometheus-tekstformat.
+
+Av som standard. Da returnerer event()/stage() en felles nullcontext og count() returnerer
+med en gang, så det eneste hendelsene betaler er ett funksjonskall og én if.
+Med enable(port) blir målingene tilgjengelige på http://<host>:<port>/metrics.
+
+    with metrics.event("message"):
+        with metrics.stage("parse"):
+            ...
+    metrics.count("quotes_added", len(reciepts))
+"""
+from __future__ import annotations
+import asyncio
+import bisect
+import contextlib
+import time
+from typing import ContextManager, Optional
+
+PREFIX = "teknobyen"
+# Sekunder. Discord-hendelser ligger typisk fra under et millisekund til noen sekunder
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Histogram:
+    """Antall målinger per bøtte, per label (hendelse eller steg)"""
+
+    def __init__(self, name: str, description: str, label: str) -> None:
+        self.name = name
+        self.description = description
+        self.label = label
+        # label -> [antall i hver bøtte, siste er +Inf]
+        self.buckets: dict[str, list[int]] = {}
+        self.sums: dict[str, float] = {}
+
+    def observe(self, label: str, seconds: float) -> None:
+        buckets = self.buckets.get(label)
+        if buckets is None:
+            buckets = self.buckets[label] = [0] * (len(BUCKETS) + 1)
+            self.sums[label] = 0.0
+        buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sums[label] += seconds
+
+    def count(self, label: str) -> int:
+        return sum(self.buckets.get(label, ()))
+
+    def quantile(self, label: str, q: float) -> float:
+        """Øvre grense for bøtta kvantilen havner i. inf hvis den er over største bøtte"""
+        buckets = self.buckets.get(label)
+        if buckets is None:
+            return 0.0
+        target = q * sum(buckets)
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label, buckets in sorted(self.buckets.items()):
+            labels = f'{self.label}="{label}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += buckets[-1]
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {self.sums[label]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Timer:
+    __slots__ = ("histogram", "label", "start")
+
+    def __init__(self, histogram: Histogram, label: str) -> None:
+        self.histogram = histogram
+        self.label = label
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.histogram.observe(self.label, time.perf_counter() - self.start)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.port: Optional[int] = None
+        self.host = "127.0.0.1"
+        self.started = time.time()
+        self.events = Histogram(f"{PREFIX}_event_seconds", "Tid per Discord-hendelse", "event")
+        self.stages = Histogram(
+            f"{PREFIX}_stage_seconds", "Tid per steg (parse, validate, persist, send, ...)", "stage"
+        )
+        self.loop_lag = Histogram(
+            f"{PREFIX}_loop_lag_seconds", "Hvor mye senere enn planlagt event-loopen kjørte", "loop"
+        )
+        self.counters: dict[str, int] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def render(self) -> str:
+        lines = [*self.events.render(), *self.stages.render(), *self.loop_lag.render()]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def enable(port: Optional[int] = None, host: str = "127.0.0.1") -> None:
+    """Slår på målingene. Med port starter start_server() et HTTP-endepunkt for Prometheus"""
+    _metrics.enabled = True
+    _metrics.port = port
+    _metrics.host = host
+
+
+def is_enabled() -> bool:
+    return _metrics.enabled
+
+
+def event(name: str) -> ContextManager[None]:
+    if not _metrics.enabled:
+        return _NULL_CONTEXT
+    return Timer(_metrics.events, name)
+
+
+def stage(name: str) -> ContextManager[None]:
+    if not _metrics.enabled:
+        return _NULL_CONTEXT
+    return Timer(_metrics.stages, name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    if not _metrics.enabled or amount == 0:
+        return
+    _metrics.counters[name] = _metrics.counters.get(name, 0) + amount
+
+
+def loop_lag(seconds: float) -> None:
+    if not _metrics.enabled:
+        return
+    _metrics.loop_lag.observe("main", seconds)
+
+
+def render_prometheus() -> str:
+    return _metrics.render()
+
+
+def summary() -> str:
+    """Kort oversikt for !stats. Kvantilene er øvre grense for bøtta de havner i"""
+    if not _metrics.enabled:
+        return "Målinger er slått av. Start boten med METRICS=1 eller METRICS_PORT"
+
+    def format_histogram(histogram: Histogram) -> list[str]:
+        lines = []
+        for label in sorted(histogram.buckets):
+            total = histogram.count(label)
+            mean = histogram.sums[label] / total * 1000
+            p50 = histogram.quantile(label, 0.5) * 1000
+            p99 = histogram.quantile(label, 0.99) * 1000
+            lines.append(f"{label}: {total} stk, snitt {mean:.1f} ms, p50 ≤ {p50:g} ms, p99 ≤ {p99:g} ms")
+        return lines or ["ingen ennå"]
+
+    uptime = format_uptime(time.time() - _metrics.started)
+    lines = [f"Oppe i {uptime}", "", "Hendelser:", *format_histogram(_metrics.events)]
+    lines += ["", "Steg:", *format_histogram(_metrics.stages)]
+    if len(_metrics.loop_lag.buckets) != 0:
+        lines += ["", "Event-loop-forsinkelse:", *format_histogram(_metrics.loop_lag)]
+    if len(_metrics.counters) != 0:
+        lines += ["", "Tellere:"]
+        lines += [f"{name}: {value}" for name, value in sorted(_metrics.counters.items())]
+    return "\n".join(lines)
+
+
+def format_uptime(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}t {minutes}m" if days != 0 else f"{hours}t {minutes}m {seconds}s"
+
+
+async def handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        # Resten av headerne er uinteressante, men må leses før vi svarer
+        while (await reader.readline()).strip() != b"":
+            pass
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[1] == b"/metrics":
+            status, body = "200 OK", render_prometheus().encode()
+        else:
+            status, body = "404 Not Found", b"Se /metrics\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server() -> None:
+    """Starter HTTP-endepunktet hvis enable() fikk en port. Trygt å kalle flere ganger (on_ready)"""
+    if not _metrics.enabled or _metrics.port is None or _metrics.server is not None:
+        return
+    _metrics.server = await asyncio.start_server(handle_request, _metrics.host, _metrics.port)
@@ -0,0 +1,137 @@
+"""
+Uskarpt oppslag på navnene i sitatene, slik at "Thorbjørn", "thorbjorn" og "Thorbjørn D."
+blir funnet som samme person.
+
+Navnene blir normalisert (casefold, æ/ø/å -> ae/o/a, uten tegnsetting) og delt i trigrammer.
+Et oppslag ser bare på navnene som deler minst ett trigram med søket,
+og likheten er Dice-koeffisienten til trigrammene.
+"""
+from __future__ import annotations
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from index import Index
+from quote import Quote
+
+# Hvor like to navn må være (0-1) for å regnes som samme person
+SIMILARITY_THRESHOLD = 0.6
+
+TRANSLITERATION = str.maketrans({"æ": "ae", "ø": "o", "å": "a", "ä": "ae", "ö": "o"})
+NON_LETTERS = re.compile(r"[\W_]+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    name = unicodedata.normalize("NFKC", name).casefold().translate(TRANSLITERATION)
+    name = "".join(
+        c for c in unicodedata.normalize("NFD", name) if not unicodedata.combining(c)
+    )
+    return NON_LETTERS.sub(" ", name).strip()
+
+
+@lru_cache(maxsize=4096)
+def trigrams(normalized_name: str) -> frozenset[str]:
+    padded = f"  {normalized_name} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+class NameIndex(Index[Quote]):
+    """normalisert navn -> IDene til sitatene der navnet er avsender eller publikum"""
+
+    def __init__(self) -> None:
+        self.speakers: dict[str, set[int]] = {}
+        self.audiences: dict[str, set[int]] = {}
+        # Skrivemåtene som er brukt for hvert normaliserte navn, og hvor mange ganger
+        self.spellings: dict[str, Counter[str]] = {}
+        self.trigram_names: dict[str, set[str]] = {}
+
+    def clear(self) -> None:
+        self.speakers.clear()
+        self.audiences.clear()
+        self.spellings.clear()
+        self.trigram_names.clear()
+
+    def add(self, key: int, value: Quote) -> None:
+        self._add_name(self.speakers, key, value.speaker)
+        for name in value.audience:
+            self._add_name(self.audiences, key, name)
+
+    def remove(self, key: int, value: Quote) -> None:
+        self._remove_name(self.speakers, key, value.speaker)
+        for name in value.audience:
+            self._remove_name(self.audiences, key, name)
+
+    def _add_name(self, role: dict[str, set[int]], key: int, name: str) -> None:
+        normalized = normalize_name(name)
+        role.setdefault(normalized, set()).add(key)
+        spellings = self.spellings.get(normalized)
+        if spellings is None:
+            spellings = self.spellings[normalized] = Counter()
+            for trigram in trigrams(normalized):
+                self.trigram_names.setdefault(trigram, set()).add(normalized)
+        spellings[name] += 1
+
+    def _remove_name(self, role: dict[str, set[int]], key: int, name: str) -> None:
+        normalized = normalize_name(name)
+        keys = role.get(normalized)
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del role[normalized]
+
+        spellings = self.spellings.get(normalized)
+        if spellings is None:
+            return
+        spellings[name] -= 1
+        if spellings[name] <= 0:
+            del spellings[name]
+        if len(spellings) != 0:
+            return
+        del self.spellings[normalized]
+        for trigram in trigrams(normalized):
+            names = self.trigram_names.get(trigram)
+            if names is None:
+                continue
+            names.discard(normalized)
+            if len(names) == 0:
+                del self.trigram_names[trigram]
+
+    def similar_names(
+        self, name: str, threshold: float = SIMILARITY_THRESHOLD
+    ) -> list[tuple[str, float]]:
+        """De normaliserte navnene som ligner på name, mest like først"""
+        normalized = normalize_name(name)
+        query = trigrams(normalized)
+        shared: Counter[str] = Counter()
+        for trigram in query:
+            shared.update(self.trigram_names.get(trigram, ()))
+
+        matches = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(query) + len(trigrams(candidate)))
+            if similarity >= threshold:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def by_speaker(self, name: str, threshold: float = SIMILARITY_THRESHOLD) -> set[int]:
+        return self._lookup(self.speakers, name, threshold)
+
+    def by_audience(self, name: str, threshold: float = SIMILARITY_THRESHOLD) -> set[int]:
+        return self._lookup(self.audiences, name, threshold)
+
+    def _lookup(self, role: dict[str, set[int]], name: str, threshold: float) -> set[int]:
+        keys: set[int] = set()
+        for candidate, _ in self.similar_names(name, threshold):
+            keys.update(role.get(candidate, ()))
+        return keys
+
+    def near_misses(self, name: str, threshold: float = SIMILARITY_THRESHOLD) -> list[str]:
+        """Skrivemåter som ligner på name uten å være name. Tomt hvis name er brukt før"""
+        if name in self.spellings.get(normalize_name(name), ()):
+            return []
+        return [
+            self.spellings[candidate].most_common(1)[0][0]
+            for candidate, _ in self.similar_names(name, threshold)
+        ]
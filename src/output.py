@@ -1,41 +1,217 @@
+import asyncio
+import io
 import time
 import discord
-from typing import Iterable
+from typing import Iterable, Optional
 
 from error import BaseError
+from log import log_error
 
+# Discord avviser meldinger over 2000 tegn
+MESSAGE_LIMIT = 2000
+# Flere meldinger enn dette fra én hendelse blir samlet i et vedlegg
+MAX_MESSAGES_PER_EVENT = 3
+OVERFLOW_FILENAME = "resten.txt"
+SEPARATOR = "\n\n"  # For å skape mellomrom mellom meldingene
 
-async def send_iterable(iter: Iterable[str], channel: discord.abc.Messageable) -> None:
-    message = "\n\n".join(iter)  # For å skape mellomrom mellom meldingene
-    if message == "":
+# Discord tillater omtrent 5 meldinger per 5 sekunder i hver kanal
+RATE_LIMIT_MESSAGES = 5
+RATE_LIMIT_SECONDS = 5.0
+
+
+class RateLimitBucket:
+    """
+    Token bucket for én kanal. Sendingene venter selv på tur i stedet for at
+    Discord svarer 429 og discord.py prøver på nytt.
+    """
+
+    def __init__(self, messages: int, seconds: float) -> None:
+        self.capacity = messages
+        self.refill_rate = messages / seconds
+        self.tokens = float(messages)
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        self.refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+            self.refill()
+        self.tokens -= 1
+
+
+class ChannelQueue:
+    """
+    Sendekøen til én kanal. asyncio.Lock slipper inn i den rekkefølgen de ventet,
+    så hendelsene får svarene sine i samme rekkefølge som de kom.
+    """
+
+    def __init__(self, bucket: Optional[RateLimitBucket]) -> None:
+        self.lock = asyncio.Lock()
+        self.bucket = bucket
+
+    async def send(
+        self,
+        channel: discord.abc.Messageable,
+        messages: list[str],
+        file: Optional[discord.File] = None,
+    ) -> None:
+        """Sender meldingene etter hverandre, uten at andre hendelser kommer imellom. file følger den siste"""
+        async with self.lock:
+            for i, message in enumerate(messages):
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                try:
+                    if file is not None and i == len(messages) - 1:
+                        await channel.send(message, file=file)
+                    else:
+                        await channel.send(message)
+                except Exception as err:
+                    log_error(err, message, channel=channel_key(channel))
+
+
+_rate_limit: Optional[tuple[int, float]] = (RATE_LIMIT_MESSAGES, RATE_LIMIT_SECONDS)
+_queues: dict[int, ChannelQueue] = {}
+
+
+def set_rate_limit(rate_limit: Optional[tuple[int, float]]) -> None:
+    """(meldinger, sekunder) per kanal, eller None for å sende uten å vente (lasttester)"""
+    global _rate_limit
+    _rate_limit = rate_limit
+    _queues.clear()
+
+
+def channel_key(channel: discord.abc.Messageable) -> int:
+    # Brukere (DM) og kanaler har begge id
+    key = getattr(channel, "id", None)
+    return key if key is not None else id(channel)
+
+
+def get_queue(channel: discord.abc.Messageable) -> ChannelQueue:
+    key = channel_key(channel)
+    queue = _queues.get(key)
+    if queue is None:
+        bucket = RateLimitBucket(*_rate_limit) if _rate_limit is not None else None
+        queue = _queues[key] = ChannelQueue(bucket)
+    return queue
+
+
+def split_part(part: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Deler én del som er for lang, helst på linjeskift"""
+    pieces: list[str] = []
+    current = ""
+    for line in part.split("\n"):
+        while len(line) > limit:
+            if current != "":
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if current == "":
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            pieces.append(current)
+            current = line
+    if current != "":
+        pieces.append(current)
+    return pieces
+
+
+def chunk_parts(parts: Iterable[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+    """
+    Pakker delene (et sitat, en kvittering, en feilmelding) i så få meldinger som mulig.
+    En del blir bare delt hvis den alene er lengre enn grensen.
+    """
+    chunks: list[str] = []
+    current = ""
+    for part in parts:
+        if part == "":
+            continue
+        for piece in split_part(part, limit) if len(part) > limit else [part]:
+            if current == "":
+                current = piece
+            elif len(current) + len(SEPARATOR) + len(piece) <= limit:
+                current += SEPARATOR + piece
+            else:
+                chunks.append(current)
+                current = piece
+    if current != "":
+        chunks.append(current)
+    return chunks
+
+
+async def send_parts(parts: Iterable[str], channel: discord.abc.Messageable) -> None:
+    """
+    Sender delene som få meldinger under størrelsesgrensen.
+    Blir det flere enn MAX_MESSAGES_PER_EVENT, havner resten i en tekstfil på siste melding.
+    """
+    parts = [part for part in parts if part != ""]
+    chunks = chunk_parts(parts)
+    if len(chunks) == 0:
+        return
+    queue = get_queue(channel)
+    if len(chunks) <= MAX_MESSAGES_PER_EVENT:
+        await queue.send(channel, chunks)
         return
-    await send_message(message, channel)
+
+    rest = chunks[MAX_MESSAGES_PER_EVENT - 1 :]
+    file = discord.File(io.BytesIO(SEPARATOR.join(rest).encode()), filename=OVERFLOW_FILENAME)
+    note = f"Resten ({len(rest)} meldinger) ligger i vedlegget."
+    await queue.send(channel, chunks[: MAX_MESSAGES_PER_EVENT - 1] + [note], file)
+
+
+class Outbox:
+    """
+    Samler alt én hendelse vil sende, per kanal, og sender det samlet med flush().
+    Advarsler, kvitteringer og feil til samme kanal blir da så få meldinger som mulig.
+    """
+
+    def __init__(self) -> None:
+        # dict holder på rekkefølgen kanalene ble brukt i
+        self.channels: dict[int, tuple[discord.abc.Messageable, list[str]]] = {}
+
+    def parts(self, channel: discord.abc.Messageable) -> list[str]:
+        key = channel_key(channel)
+        if key not in self.channels:
+            self.channels[key] = (channel, [])
+        return self.channels[key][1]
+
+    def add(self, message: str, channel: discord.abc.Messageable) -> None:
+        self.parts(channel).append(message)
+
+    def add_iterable(self, iter: Iterable[str], channel: discord.abc.Messageable) -> None:
+        self.parts(channel).extend(iter)
+
+    def add_errors(self, errors: Iterable[BaseError], channel: discord.abc.Messageable) -> None:
+        self.parts(channel).extend(err.msg for err in errors)
+
+    async def flush(self) -> None:
+        channels = list(self.channels.values())
+        self.channels.clear()
+        for channel, parts in channels:
+            await send_parts(parts, channel)
+
+
+async def send_iterable(iter: Iterable[str], channel: discord.abc.Messageable) -> None:
+    await send_parts(iter, channel)
 
 
 async def send_message(message: str, response_channel: discord.abc.Messageable) -> None:
     """send_message
 
     Args:
-        response (Message): meldingen som skal sendes
+        message (str): meldingen som skal sendes. Blir delt opp hvis den er for lang
     """
-    try:
-        response_channel = response_channel
-        await response_channel.send(message)
-    except Exception as err:
-        log_error(err, message)
+    await send_parts([message], response_channel)
 
 
 async def send_errors(errors: list[BaseError], response_channel: discord.abc.Messageable) -> None:
     error_messages = [err.msg for err in errors]
     await send_iterable(error_messages, response_channel)
 
-
-def log_error(err: Exception, *args):
-    with open("log.txt", "a+") as log_file:
-        date = time.ctime()
-        message = f"[{date}]  {str(type(err))}\n{str(err)}\n"
-        log_file.write(message)
-        for arg in args:
-            log_file.write("\n")
-            log_file.write(arg)
-        log_file.write("\n\n" + "-" * 10 + "\n\n")
@@ -1,12 +1,14 @@
 from __future__ import annotations
-from typing import Iterable, Optional, Callable
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
 from result import Result, Err, Ok
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError, dataclass
 from textwrap import indent
 
 
 KEY_SPECIFIER = "--"
 FLAG_SPECIFIER = "-"
+QUOTES = ("'", '"')
 
 
 """
@@ -41,7 +43,7 @@ class Tree:
 
     @attrs
     root: str
-    leaves: Optional[list[Tree]]
+    leaves: Optional[list[Tree]]  (tuple etter freeze())
 
     @Example
     Tree {
@@ -55,6 +57,26 @@ class Tree:
     root: str
     leaves: Optional[list[Tree]] = None
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise FrozenInstanceError(f"Treet er frosset og kan ikke endres: {self.root}")
+        super().__setattr__(name, value)
+
+    def freeze(self) -> Tree:
+        """
+        Gjør treet og alle subtrærne uforanderlige, slik at det kan deles trygt (se CommandCache).
+        add_subtree på et frosset tre kaster FrozenInstanceError
+
+        @returns
+        self
+        """
+        if self.leaves is not None:
+            for leaf in self.leaves:
+                leaf.freeze()
+            object.__setattr__(self, "leaves", tuple(self.leaves))
+        object.__setattr__(self, "_frozen", True)
+        return self
+
     def add_subtree(self, tree: Tree) -> None:
         """
         Legger til et subtre til @self ved mutasjon
@@ -65,6 +87,8 @@ class Tree:
         @returns
         None
         """
+        if getattr(self, "_frozen", False):
+            raise FrozenInstanceError(f"Treet er frosset og kan ikke endres: {self.root}")
         if self.leaves is None:
             self.leaves = [tree]
         else:
@@ -114,49 +138,150 @@ class Expr(Tree):
     pass
 
 
-def parse(
-    parser: Callable[[str], Result[tuple[Optional[Tree], str], str]],
-    parse_string: str,
-) -> Result[tuple[Optional[Tree], str], str]:
+class Lexer:
     """
-    @param:
-        parser: (parse-string) -> Result (Optional Tree, tail)
-        parse_string: str
-
-    @returns:
-        Result[ (Tree, parse_string tail) ]
+    Leser kommandostrengen én gang fra venstre mot høyre.
+    I stedet for å kopiere halen av strengen for hver del som tolkes, flyttes en indeks (pos),
+    og bare selve navnene og verdiene blir kopiert ut.
     """
-    parse_string = parse_string.strip()
-    if len(parse_string) == 0:
-        return Ok((None, ""))
-    return parser(parse_string)
 
+    def __init__(self, string: str) -> None:
+        self.string = string.strip()
+        self.pos = 0
+        # Satt midt i flagg som '-rf' etter at r er lest: da står det et underforstått '-' foran pos
+        self.in_flags = False
+
+    def tail(self) -> str:
+        """Resten av strengen som ikke er tolket"""
+        if self.in_flags:
+            return FLAG_SPECIFIER + self.string[self.pos :]
+        return self.string[self.pos :]
+
+    def skip_whitespace(self) -> int:
+        pos = self.pos
+        while pos < len(self.string) and self.string[pos].isspace():
+            pos += 1
+        return pos
+
+    def word(self, start: int) -> tuple[str, int]:
+        """
+        @returns
+            (teksten fram til neste mellomrom, posisjonen etter mellomrommet)
+        """
+        end = self.string.find(" ", start)
+        if end == -1:
+            return self.string[start:], len(self.string)
+        return self.string[start:end], end + 1
 
-def exhaust_parser(
-    parser: Callable[[str], Result[tuple[Optional[Tree], str], str]],
-    parse_string: str,
-) -> Result[tuple[list[Tree], str], str]:
-    """
-    @param:
-        parser: (parse-string) -> Result (Optional Tree, tail)
-        parse_string: str
+    def name(self) -> Optional[str]:
+        """
+        @grammar
+            name = char{ symbols }
+        """
+        if len(self.string) == 0:
+            return None
+        name, end = self.word(0)
+        if not (is_symbol(name) and name[0].isalpha()):
+            return None
+        self.pos = end
+        return name
+
+    def flag(self) -> Optional[Tree]:
+        """
+        @grammar
+            flags = '-'(char{chars})
+        Ett flagg om gangen; '-rf' gir Flag(r) og så Flag(f)
+        """
+        if self.in_flags:
+            flag_pos = self.pos
+        else:
+            start = self.skip_whitespace()
+            if not is_flag(self.string[start : start + 1]):
+                return None
+            flag_pos = start + 1
+
+        if flag_pos >= len(self.string) or not self.string[flag_pos].isalnum():
+            return None
+        flag = self.string[flag_pos]
+        next_pos = flag_pos + 1
+        if next_pos < len(self.string) and self.string[next_pos] != " ":
+            self.pos = next_pos
+            self.in_flags = True
+        else:
+            self.pos = min(next_pos + 1, len(self.string))
+            self.in_flags = False
+        return Flag(flag)
 
-    @returns:
-        Result ([Tree], tail)
-    """
-    tree_list = []
-    while True:
-        match parse(parser, parse_string):
+    def value(self) -> Result[Optional[Tree], str]:
+        """
+        @grammar
+            value =
+                | symbol{ symbols }
+                | expr
+        """
+        if self.in_flags:
+            return Ok(None)
+        start = self.skip_whitespace()
+        if start >= len(self.string):
+            return Ok(None)
+
+        quote_type = self.string[start]
+        if quote_type in QUOTES and len(self.string) - start >= 2:
+            end = self.string.find(quote_type, start + 1)
+            if end == -1:
+                return Err(f"Fant ( {quote_type} ), som ikke var lukket")
+            self.pos = end + 1
+            return Ok(Expr(self.string[start + 1 : end]))
+
+        if is_flag(quote_type):
+            return Ok(None)
+        content, end = self.word(start)
+        if not is_symbol(content):
+            return Ok(None)
+        self.pos = end
+        return Ok(Value(content))
+
+    def arg(self) -> Result[Optional[Tree], str]:
+        """
+        @grammar
+            arg = value | flags
+        """
+        # Flagg går foran verdier
+        flag_tree = self.flag()
+        if flag_tree is not None:
+            return Ok(flag_tree)
+        return self.value()
+
+    def kwarg(self) -> Result[Optional[Tree], str]:
+        """
+        @grammar
+            kwarg = key { value }
+        """
+        if self.in_flags:
+            # '-r-key' leses som '-r' og '--key'
+            if self.string[self.pos : self.pos + 1] != FLAG_SPECIFIER:
+                return Ok(None)
+            key_start = self.pos + 1
+        else:
+            start = self.skip_whitespace()
+            if not is_key(self.string[start : start + len(KEY_SPECIFIER)]):
+                return Ok(None)
+            key_start = start + len(KEY_SPECIFIER)
+
+        key, end = self.word(key_start)
+        if not is_symbol(key):
+            return Ok(None)
+        self.pos = end
+        self.in_flags = False
+
+        match self.value():
             case Err(err):
                 return Err(err)
-            case Ok((None, _)):
-                parse_tail = parse_string
-                break
-            case Ok((tree, tail)):
-                tree_list.append(tree)
-                parse_string = tail
-
-    return Ok((tree_list, parse_tail))
+            case Ok(None):
+                return Ok(Kwarg(key))
+            case Ok(value_tree):
+                return Ok(Kwarg(key, [value_tree]))
+        return Ok(Kwarg(key))
 
 
 def command_parser(string: str) -> Result[tuple[Optional[Tree], str], str]:
@@ -170,216 +295,83 @@ def command_parser(string: str) -> Result[tuple[Optional[Tree], str], str]:
         command = name { arguments } { kwargs }
     # Hvis en subkommando blir lagt inn som argument, blir den håndtert som value og blir håndtert i kommando-funksjonen
     """
-    match parse(name_parser, string):
-        case Err(err):
-            return Err(err)
-        case Ok((None, _)):
-            return Ok((None, string))
-        case Ok((name_tree, command_tail)) if name_tree is not None:
-            command_tree = Command(name_tree.root)
-        # For å blidgjøre typechecker
-        case other:
-            return other
-
-    match exhaust_parser(arg_parser, command_tail):
-        case Err(err):
-            return Err(err)
-        case Ok((arg_trees, arg_tail)):
-            pass
-
-    match exhaust_parser(kwarg_parser, arg_tail):
-        case Err(err):
-            return Err(err)
-        case Ok((kwarg_trees, tail)):
-            pass
-
-    command_tree.add_subtrees(arg_trees)
-    command_tree.add_subtrees(kwarg_trees)
-    return Ok((command_tree, tail))
-
-
-def value_parser(string: str) -> Result[tuple[Optional[Tree], str], str]:
-    """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree:Value { value }, tail)
-
-    @grammar
-        value =
-            | symbol{ symbols }
-            | '(expr)'
-        symbol = char | int | _
-    """
-    match get_surrounding_quotes(string):
-        case Err(err):
-            return Err(err)
-        case Ok(result) if result is not None:
-            content, _, second_index = result
-            tree = Expr(content)
-            tail = string[second_index + 1 :]
-            return Ok((tree, tail))
-
-    if is_flag(string) or is_key(string):
-        return Ok((None, string))
-
-    match string.find(" "):
-        case -1:
-            content = string
-            tail = ""
-        case index:
-            content = string[:index]
-            tail = string[index + 1 :]
-
-    if not is_symbol(content):
+    lexer = Lexer(string)
+    name = lexer.name()
+    if name is None:
         return Ok((None, string))
+    command_tree = Command(name)
 
-    return Ok((Value(content), tail))
-
+    for parser in (lexer.arg, lexer.kwarg):
+        while True:
+            match parser():
+                case Err(err):
+                    return Err(err)
+                case Ok(None):
+                    break
+                case Ok(tree):
+                    command_tree.add_subtree(tree)
 
-def name_parser(command_string: str) -> Result[tuple[Optional[Tree], str], str]:
-    """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree { name }, tail)
+    return Ok((command_tree, lexer.tail()))
 
-    @grammar
-        name = char{ symbols }
-        symbol = char | int | _
-    """
-    first_space = command_string.find(" ")
-    if first_space == -1:
-        name = command_string
-        tail = ""
-    else:
-        name = command_string[0:first_space]
-        tail = command_string[first_space + 1 :]
 
-    if is_symbol(name) and name[0].isalpha():
-        return Ok((Tree(name), tail))
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Kommandoer som var for lange til å bli cachet
+    bypassed: int = 0
 
-    return Ok((None, command_string))
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups != 0 else 0.0
+        return f"hits={self.hits} misses={self.misses} bypassed={self.bypassed} hit_rate={hit_rate:.0f}%"
 
 
-def key_parser(command_string: str) -> Result[tuple[Optional[Tree], str], str]:
+class CommandCache:
     """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree { key }, tail)
-
-    @grammar
-        key = symbol{ symbols }
-        symbol = char | int | _
+    LRU-cache av command_parser. De samme kommandoene blir skrevet om og om igjen,
+    så de blir bare tolket første gang. Trærne i cachen er frosset (Tree.freeze).
     """
-    if not is_key(command_string):
-        return Ok((None, command_string))
-    new_command_string = command_string[len(KEY_SPECIFIER) :]
 
-    first_space = new_command_string.find(" ")
-    if first_space == -1:
-        key = new_command_string
-        tail = ""
-    else:
-        key = new_command_string[0:first_space]
-        tail = new_command_string[first_space + 1 :]
+    def __init__(self, maxsize: int = 256, max_length: int = 200) -> None:
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.stats = CacheStats()
+        self.entries: OrderedDict[str, Result[tuple[Optional[Tree], str], str]] = OrderedDict()
 
-    if is_symbol(key):
-        return Ok((Tree(key), tail))
-    return Ok((None, command_string))
+    def parse(self, string: str) -> Result[tuple[Optional[Tree], str], str]:
+        # Lexer stripper strengen uansett, så "!random" og "!random " er samme oppføring
+        key = string.strip()
+        if len(key) > self.max_length:
+            self.stats.bypassed += 1
+            return command_parser(string)
 
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return result
 
-def kwarg_parser(command_string: str) -> Result[tuple[Optional[Tree], str], str]:
-    """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree:Kwarg { key, Optional value }, tail)
+        self.stats.misses += 1
+        result = command_parser(key)
+        match result:
+            case Ok((tree, _)) if tree is not None:
+                tree.freeze()
+        self.entries[key] = result
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return result
 
-    @grammar
-        kwarg = key { value }
-        key = symbol{ symbols }
-        symbol = char | int | _
-    """
-    match parse(key_parser, command_string):
-        case Err(err):
-            return Err(err)
-        case Ok((None, _)):
-            return Ok((None, command_string))
-        case Ok((key_tree, key_tail)) if key_tree is not None:
-            key = key_tree.root
-        # For å hjelpe type-checkeren
-        case other:
-            return other
-
-    match parse(value_parser, key_tail):
-        case Err(err):
-            return Err(err)
-        case Ok((None, _)):
-            return Ok((Kwarg(key), key_tail))
-        case Ok((value_tree, value_tail)) if value_tree is not None:
-            pass
-        # For å hjelpe type-checkeren
-        case other:
-            return other
-
-    return Ok((Kwarg(key, [value_tree]), value_tail))
-
-
-def flag_parser(command_string: str) -> Result[tuple[Optional[Tree], str], str]:
-    """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree:Flags { flags }, tail)
+    def clear(self) -> None:
+        self.entries.clear()
 
-    @grammar
-        flags = '-'(char{chars})
-    """
-    if not is_flag(command_string):
-        return Ok((None, command_string))
-
-    # et eventuelt flagg er på formatet '-rf'.
-    # Da ønsker vi å hente ut r; vi parser kun ett flagg om gangen
-    flag = command_string[1]
-
-    # Hvis det er et mellomrom etter flagget, eks: "-r somearg"
-    # Da trenger vi ikke ta vare på '-' tegnet
-    # Ellers tar vi vare på det slik at vi kan parse flere flagg senere
-    if command_string[2] == " ":
-        tail = command_string[3:]
-    else:
-        tail = command_string[0] + command_string[2:]
-    if flag.isalnum():
-        return Ok((Flag(flag), tail))
-    return Ok((None, command_string))
-
-
-def arg_parser(command_string: str) -> Result[tuple[Optional[Tree], str], str]:
-    """
-    @param
-        command_string: strengen som skal tolkes
-    @return
-        Result (Optional Tree:{Value|Flag} { value | flags }, tail)
 
-    @grammar
-        arg = value | flags
-    """
-    # Flags take priority over values. If the flag-parser is unable to parse any flags, we try to parse values.
-    match parse(flag_parser, command_string):
-        case Ok((flag_tree, tail)) if flag_tree is not None:
-            return Ok((flag_tree, tail))
-        case Err(err):
-            return Err(err)
+COMMAND_CACHE = CommandCache()
 
-    match parse(value_parser, command_string):
-        case Ok((value_tree, tail)) if value_tree is not None:
-            return Ok((value_tree, tail))
-        case Err(err):
-            return Err(err)
 
-    return Ok((None, command_string))
+def cached_command_parser(string: str) -> Result[tuple[Optional[Tree], str], str]:
+    """command_parser gjennom COMMAND_CACHE"""
+    return COMMAND_CACHE.parse(string)
 
 
 def is_key(arg: str) -> bool:
@@ -405,82 +397,3 @@ def is_symbol(string: str) -> bool:
     if string.replace("_", "").isalnum():
         return True
     return False
-
-
-def get_value_between_indexes(
-    string: str, first_quote_index: int, last_quote_index: int
-) -> Result[str, str]:
-    if first_quote_index > last_quote_index:
-        return Err(f"Start: {first_quote_index} er større en end: {last_quote_index}")
-    if len(string) <= last_quote_index:
-        return Err(
-            f"Strengen er ikke lang nok: length = {len(string)} | end = {last_quote_index}"
-        )
-    return Ok(string[first_quote_index + 1 : last_quote_index])
-
-
-def get_quote_pair_indexes(string: str) -> Result[Optional[tuple[int, int]], str]:
-    """
-    @param
-        string: strengen som skal søkes i
-
-    @return
-        Result[Optional[tuple[int, int]], str]: Optional (first_index, second_index) | Err
-    """
-    first_quote_index = 0
-    second_quote_index = 0
-
-    first_single_quote_index = string.find("'")
-    first_double_quote_index = string.find('"')
-
-    match (first_single_quote_index, first_double_quote_index):
-        case (-1, -1):
-            return Ok(None)
-        case (-1, index):
-            first_quote_index = index
-            quote_type = '"'
-        case (index, -1):
-            first_quote_index = index
-            quote_type = "'"
-        case (single_quote_index, double_quote_index):
-            if single_quote_index > double_quote_index:
-                first_quote_index = single_quote_index
-                quote_type = "'"
-            else:
-                first_quote_index = double_quote_index
-                quote_type = '"'
-
-    match string.find(quote_type, first_quote_index + 1):
-        case -1:
-            return Err(f"Fant ( {quote_type} ), som ikke var lukket")
-        case index:
-            second_quote_index = index
-
-    return Ok((first_quote_index, second_quote_index))
-
-
-def get_surrounding_quotes(
-    string: str,
-) -> Result[Optional[tuple[str, int, int]], str]:
-    """
-    @returns
-        Result {Optional (content, 0, second_quote_index) }
-    """
-    if len(string) < 2:
-        return Ok(None)
-    if string[0] == "'" or string[0] == '"':
-        match get_quote_pair_indexes(string):
-            case Err(err):
-                return Err(err)
-            case Ok((first_index, second_index)):
-                pass
-            case _:
-                return Ok(None)
-
-        match get_value_between_indexes(string, first_index, second_index):
-            case Ok(content):
-                return Ok((content, first_index, second_index))
-            case other:
-                return other
-
-    return Ok(None)
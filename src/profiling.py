@@ -0,0 +1,274 @@
+"""
+Profilering som kan slås på mens boten kjører, uten å koble til med en profiler.
+
+Et opptak (capture) varer til stop_capture() eller til tiden går ut (DEFAULT_CAPTURE_SECONDS):
+- cProfile måler en andel (sample_rate) av handler-kallene og skrivingen i Database.
+  Skrivetrådene får hver sin Profile, som slås sammen når opptaket lagres.
+- tracemalloc følger allokeringene, og lagrer et snapshot når opptaket stopper.
+
+Filene havner i output-mappen (src/profiles, eller <save_dir>/profiles fra main.py) som
+capture-<tid>.prof og capture-<tid>.tracemalloc, og bare de MAX_CAPTURES nyeste opptakene
+blir beholdt. Les dem med
+    python -m pstats capture-<tid>.prof
+    tracemalloc.Snapshot.load("capture-<tid>.tracemalloc")
+
+Å lagre filene (pstats og tracemalloc-snapshotet) tar tid, så når opptaket stopper av seg
+selv eller med !profile stop, skjer det i en egen tråd og ikke på event-loopen.
+
+Uten et aktivt opptak returnerer profile() en felles nullcontext.
+"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ContextManager, Iterator, Optional
+from log import log_event
+
+DEFAULT_CAPTURE_SECONDS = 300.0
+MAX_CAPTURES = 5
+TOP_COUNT = 10
+TRACEMALLOC_FRAMES = 10
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+@dataclass
+class CaptureReport:
+    profile_path: Optional[Path]
+    snapshot_path: Optional[Path]
+    sampled_calls: int
+    top_functions: str
+    top_allocators: str
+
+    def __str__(self) -> str:
+        lines = [f"{self.sampled_calls} kall målt"]
+        if self.profile_path is not None:
+            lines.append(f"Profil: {self.profile_path}")
+        if self.snapshot_path is not None:
+            lines.append(f"Minne: {self.snapshot_path}")
+        lines += ["", "Mest tid (kumulativt):", self.top_functions]
+        lines += ["", "Mest minne:", self.top_allocators]
+        return "\n".join(lines)
+
+
+class Capture:
+    def __init__(self, output_dir: Path, sample_rate: float, deadline: Optional[float]) -> None:
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.deadline = deadline
+        self.started = time.time()
+        # Stopper opptaket når tiden går ut, også om ingenting blir målt
+        self.timer: Optional[threading.Timer] = None
+        self.sampled_calls = 0
+        # Én Profile per tråd: cProfile måler bare tråden den ble slått på i
+        self.profiles: dict[int, cProfile.Profile] = {}
+        self.running: set[int] = set()
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    @contextlib.contextmanager
+    def profile(self) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        # Kallet er med i utvalget, og ingen annen måling kjører allerede i denne tråden.
+        # Korutiner som kjører mens en annen venter, blir med i den målingen
+        if thread_id in self.running or self.rng.random() >= self.sample_rate:
+            yield
+            return
+        with self.lock:
+            profile = self.profiles.get(thread_id)
+            if profile is None:
+                profile = self.profiles[thread_id] = cProfile.Profile()
+            self.sampled_calls += 1
+        self.running.add(thread_id)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.running.discard(thread_id)
+
+    def finish(self) -> CaptureReport:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        name = "capture-" + time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+
+        profile_path = None
+        top_functions = "ingen kall målt"
+        with self.lock:
+            profiles = list(self.profiles.values())
+        if len(profiles) != 0:
+            stream = io.StringIO()
+            stats = pstats.Stats(profiles[0], stream=stream)
+            for profile in profiles[1:]:
+                stats.add(profile)
+            profile_path = self.output_dir / f"{name}.prof"
+            stats.dump_stats(profile_path)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_COUNT)
+            top_functions = trim_pstats(stream.getvalue())
+
+        snapshot_path = None
+        top_allocators = "tracemalloc var allerede i bruk"
+        if self.started_tracemalloc:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            tracemalloc.stop()
+            snapshot_path = self.output_dir / f"{name}.tracemalloc"
+            snapshot.dump(str(snapshot_path))
+            top_allocators = "\n".join(
+                str(statistic) for statistic in snapshot.statistics("lineno")[:TOP_COUNT]
+            )
+
+        remove_old_captures(self.output_dir)
+        return CaptureReport(
+            profile_path, snapshot_path, self.sampled_calls, top_functions, top_allocators
+        )
+
+
+def trim_pstats(text: str) -> str:
+    """Fjerner overskriften fra print_stats, og beholder tabellen"""
+    lines = text.strip().splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().startswith("ncalls"):
+            return "\n".join(lines[i:])
+    return "\n".join(lines)
+
+
+def remove_old_captures(output_dir: Path) -> None:
+    captures = sorted(output_dir.glob("capture-*.prof")) + sorted(
+        output_dir.glob("capture-*.tracemalloc")
+    )
+    names = sorted({path.name.split(".")[0] for path in captures})
+    for name in names[:-MAX_CAPTURES]:
+        for path in output_dir.glob(f"{name}.*"):
+            path.unlink(missing_ok=True)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        # Ved siden av modulen, ikke i mappen boten tilfeldigvis ble startet fra. main.py bruker save_dir
+        self.output_dir = Path(__file__).parent / "profiles"
+        self.sample_rate = 0.1
+        self.capture: Optional[Capture] = None
+        self.last_report: Optional[CaptureReport] = None
+        self.lock = threading.Lock()
+        # Holder på taskene som lagrer opptak, så de ikke blir samlet inn av gc underveis
+        self.finishing: set[asyncio.Task[CaptureReport]] = set()
+
+
+_profiler = Profiler()
+
+
+def configure(output_dir: Path, sample_rate: Optional[float] = None) -> None:
+    _profiler.output_dir = output_dir
+    if sample_rate is not None:
+        _profiler.sample_rate = sample_rate
+
+
+def is_capturing() -> bool:
+    return _profiler.capture is not None
+
+
+def start_capture(
+    seconds: Optional[float] = DEFAULT_CAPTURE_SECONDS, sample_rate: Optional[float] = None
+) -> bool:
+    """Starter et opptak. Med seconds=None varer det til stop_capture().
+    Returnerer False hvis et opptak allerede kjører
+    """
+    with _profiler.lock:
+        if _profiler.capture is not None:
+            return False
+        deadline = time.monotonic() + seconds if seconds is not None else None
+        rate = sample_rate if sample_rate is not None else _profiler.sample_rate
+        capture = _profiler.capture = Capture(_profiler.output_dir, rate, deadline)
+        if seconds is not None:
+            # Timer-tråden lagrer også filene, så event-loopen merker ingenting
+            capture.timer = threading.Timer(seconds, stop_capture, args=(capture,))
+            capture.timer.daemon = True
+            capture.timer.start()
+    log_event("Profilering startet", sample_rate=rate, seconds=seconds)
+    return True
+
+
+def _detach_capture(capture: Optional[Capture] = None) -> Optional[Capture]:
+    """Tar opptaket ut av bruk, så ingen nye kall blir målt. Med capture bare hvis det er det aktive"""
+    with _profiler.lock:
+        if _profiler.capture is None or (capture is not None and _profiler.capture is not capture):
+            return None
+        capture, _profiler.capture = _profiler.capture, None
+    if capture.timer is not None:
+        capture.timer.cancel()
+    return capture
+
+
+def _finish(capture: Capture) -> CaptureReport:
+    report = capture.finish()
+    _profiler.last_report = report
+    log_event(
+        "Profilering stoppet",
+        profile=str(report.profile_path),
+        snapshot=str(report.snapshot_path),
+        sampled_calls=report.sampled_calls,
+        top_allocators=report.top_allocators,
+    )
+    return report
+
+
+def stop_capture(capture: Optional[Capture] = None) -> Optional[CaptureReport]:
+    """Stopper opptaket og lagrer filene i denne tråden. None hvis ingen opptak kjørte"""
+    capture = _detach_capture(capture)
+    if capture is None:
+        return None
+    return _finish(capture)
+
+
+def stop_capture_in_background() -> bool:
+    """Stopper opptaket med en gang, og lagrer filene i en annen tråd (asyncio.to_thread
+    fra event-loopen). Rapporten havner i loggen og i capture_status().
+    Returnerer False hvis ingen opptak kjørte
+    """
+    capture = _detach_capture()
+    if capture is None:
+        return False
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        threading.Thread(target=_finish, args=(capture,), name="profiling-finish").start()
+        return True
+    task = loop.create_task(asyncio.to_thread(_finish, capture))
+    _profiler.finishing.add(task)
+    task.add_done_callback(_profiler.finishing.discard)
+    return True
+
+
+def capture_status() -> str:
+    capture = _profiler.capture
+    if capture is None:
+        if _profiler.last_report is None:
+            return "Ingen profilering kjører"
+        return f"Ingen profilering kjører. Siste opptak:\n{_profiler.last_report}"
+    status = f"Profilerer {capture.sample_rate:.0%} av kallene, {capture.sampled_calls} målt så langt"
+    if capture.deadline is not None:
+        status += f", stopper om {max(0, capture.deadline - time.monotonic()):.0f}s"
+    return status
+
+
+def profile() -> ContextManager[None]:
+    """Måler blokken med cProfile hvis et opptak kjører og kallet blir trukket ut"""
+    capture = _profiler.capture
+    if capture is None:
+        return _NULL_CONTEXT
+    if capture.deadline is not None and time.monotonic() >= capture.deadline:
+        # Timeren har ikke rukket å stoppe opptaket ennå
+        return _NULL_CONTEXT
+    return capture.profile()
@@ -1,11 +1,76 @@
+import sys
 from dataclasses import dataclass
+from typing import Any, Iterable
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Quote:
+    """
+    Uforanderlig sitat. Navnene blir internert, slik at samme navn
+    i tusenvis av sitat bare ligger én gang i minnet.
+    """
+
     speaker: str
-    audience: list[str]
+    audience: tuple[str, ...]
     quote: str
     message_id: int
 
+    def __init__(
+        self, speaker: str, audience: Iterable[str], quote: str, message_id: int
+    ) -> None:
+        object.__setattr__(self, "speaker", sys.intern(speaker))
+        object.__setattr__(self, "audience", intern_names(audience))
+        object.__setattr__(self, "quote", quote)
+        object.__setattr__(self, "message_id", message_id)
+
+    @classmethod
+    def from_record(
+        cls, speaker: str, audience: Iterable[str], quote: str, message_id: int
+    ) -> "Quote":
+        """Samme som Quote(...), men setter slot-feltene direkte i stedet for med fire
+        object.__setattr__. Brukes når hundretusenvis av sitat leses inn, se storage_format.
+        Må holdes i takt med __init__ (tests/test_quote.py sjekker det).
+        """
+        new_quote = object.__new__(cls)
+        _set_speaker(new_quote, sys.intern(speaker))
+        _set_audience(new_quote, intern_names(audience))
+        _set_quote(new_quote, quote)
+        _set_message_id(new_quote, message_id)
+        return new_quote
+
+    def __getstate__(self) -> tuple[str, tuple[str, ...], str, int]:
+        return (self.speaker, self.audience, self.quote, self.message_id)
+
+    def __setstate__(self, state: Any) -> None:
+        # Sitat pickles før Quote fikk __slots__ har en dict som state
+        if isinstance(state, dict):
+            state = (
+                state["speaker"],
+                state["audience"],
+                state["quote"],
+                state["message_id"],
+            )
+        speaker, audience, quote, message_id = state
+        Quote.__init__(self, speaker, audience, quote, message_id)
+
     def __str__(self) -> str:
-        return f"Quote(speaker='{self.speaker}', audience={self.audience}, quote='{self.quote}')"
+        return f"Quote(speaker='{self.speaker}', audience={list(self.audience)}, quote='{self.quote}')"
+
+
+# Slot-beskrivelsene, som setter feltene forbi den frosne dataklassens __setattr__
+_set_speaker = Quote.speaker.__set__  # type: ignore[attr-defined]
+_set_audience = Quote.audience.__set__  # type: ignore[attr-defined]
+_set_quote = Quote.quote.__set__  # type: ignore[attr-defined]
+_set_message_id = Quote.message_id.__set__  # type: ignore[attr-defined]
+
+
+def intern_names(names: Iterable[str]) -> tuple[str, ...]:
+    return tuple([sys.intern(name) for name in names])
+
+
+Fingerprint = tuple[str, tuple[str, ...], str]
+
+
+def quote_fingerprint(quote: Quote) -> Fingerprint:
+    """Innholdet som avgjør om to sitat er like (uavhengig av hvilken melding de kom fra)"""
+    return (quote.speaker, quote.audience, quote.quote)
@@ -0,0 +1,82 @@
+"""Kommandoene i quotes-interactive"""
+from result import Result, Err, Ok
+from command import Arguments, Command, Context, KwargArgument, PositionalArgument
+from quote import Quote
+import quote_utils
+
+RESULT_LIMIT = 5
+
+
+def present_results(results: list[tuple[int, Quote]], query: str) -> Result[str, str]:
+    if len(results) == 0:
+        return Err(f"Fant ingen sitat som passer med {query}")
+    return Ok(
+        "\n\n".join(
+            f"ID {key}:\n{quote_utils.present_quote(quote)}" for key, quote in results
+        )
+    )
+
+
+class SearchCommand(Command):
+    def __init__(self) -> None:
+        super().__init__(
+            "search",
+            "Søker i sitatteksten. Alle ordene må være med, og tekst i hermetegn må stå akkurat slik",
+            aliases=["søk"],
+            pos_args=[PositionalArgument("query", str, "Ord og fraser å søke etter", None, many=True)],
+            kwargs=[KwargArgument("limit", int, "Hvor mange sitat som vises", RESULT_LIMIT)],
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        # Verdier med mellomrom kom fra hermetegn, og skal søkes etter som fraser
+        query = " ".join(
+            f'"{value}"' if " " in value else value for value in arguments["query"]
+        )
+        if query == "":
+            return Err(self.help)
+        results = context.database.search(query, arguments["limit"])
+        return present_results(results, query)
+
+
+class NameCommand(Command):
+    """!speaker og !audience: de nyeste sitatene med et navn som ligner på søket"""
+
+    def __init__(self, name: str, description: str, audience: bool) -> None:
+        self.audience = audience
+        super().__init__(
+            name,
+            description,
+            pos_args=[PositionalArgument("name", str, "Navnet, gjerne med skrivefeil", None)],
+            kwargs=[KwargArgument("limit", int, "Hvor mange sitat som vises", RESULT_LIMIT)],
+        )
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        database = context.database
+        name = arguments["name"]
+        if self.audience:
+            keys = database.get_by_audience(name)
+        else:
+            keys = database.get_by_speaker(name)
+        newest = sorted(keys, reverse=True)[: arguments["limit"]]
+        results = [(key, quote) for key in newest if (quote := database.get(key)) is not None]
+        return present_results(results, name)
+
+
+class RandomCommand(Command):
+    def __init__(self) -> None:
+        super().__init__("random", "Et tilfeldig sitat", aliases=["tilfeldig"])
+
+    def main(self, arguments: Arguments, context: Context) -> Result[str, str]:
+        quote = context.database.get_random_element()
+        if quote is None:
+            return Err("Databasen er tom")
+        return Ok(quote_utils.present_quote(quote))
+
+
+def create_commands() -> list[Command]:
+    return [
+        SearchCommand(),
+        NameCommand("speaker", "Sitat sagt av noen", audience=False),
+        NameCommand("audience", "Sitat sagt til noen", audience=True),
+        RandomCommand(),
+    ]
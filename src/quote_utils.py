@@ -1,10 +1,12 @@
 from __future__ import annotations
+from typing import Optional
 from result import Result, Err, Ok
 from database import Database
 from quote import Quote
 from error import (
     DatabaseError,
     DuplicateQuoteError,
+    ErrorLevel,
     FormatError,
     BaseError,
     create_error,
@@ -35,8 +37,8 @@ def get_quote_IDs(
 
 def get_quote_ID(quote: Quote, database: Database[Quote]) -> Result[int, BaseError]:
     try:
-        for ID, quote_entry in database.items():
-            if quote_entry == quote:
+        for ID in sorted(database.get_by_content(quote)):
+            if database.get(ID) == quote:
                 return Ok(ID)
         return create_error(f"Dette sitatet finnes ikke i databasen, {quote}")
     except Exception as err:
@@ -57,15 +59,21 @@ def add_quotes(
     """
     errors: list[BaseError] = []
     reciepts: list[str] = []
-    for quote in quotes:
-        match add_quote_to_database(quote, database):
-            case Err(err):
-                error_message = f"{quote} ble ikke lagt til i databasen grunnet feil: {{\n    {err.msg}\n}}"
-                error_type = type(err)
-                errors.append(error_type(error_message))
-                continue
-            case Ok(reciept):
-                reciepts.append(reciept)
+    try:
+        # Alle sitatene fra meldingen lagres i én skriving; feiler den, lagres ingen
+        with database.transaction():
+            for quote in quotes:
+                match add_quote_to_database(quote, database):
+                    case Err(err):
+                        error_message = f"{quote} ble ikke lagt til i databasen grunnet feil: {{\n    {err.msg}\n}}"
+                        error_type = type(err)
+                        errors.append(error_type(error_message))
+                        continue
+                    case Ok(reciept):
+                        reciepts.append(reciept)
+    except Exception as err:
+        error_message = f"Ingen av sitatene ble lagt til i databasen grunnet feil: {{\n    {str(err)}\n}}\nKontakt {CONTACT_PERSON}"
+        return [], [DatabaseError(error_message)]
     return reciepts, errors
 
 
@@ -104,21 +112,39 @@ def remove_quotes(
     """
     errors: list[BaseError] = []
     reciepts: list[str] = []
-    for quote_ID in quotes_IDs:
-        match remove_quote_from_database(quote_ID, database):
-            case Err(err):
-                error_message = (
-                    f"Kunne ikke slette sitat {quote_ID} grunnet: {{\n    {err.msg}\n}}"
-                )
-                error_type = type(err)
-                errors.append(error_type(error_message))
-                continue
-            case Ok(reciept):
-                reciepts.append(reciept)
+    try:
+        # Alle slettingene lagres i én skriving; feiler den, slettes ingen
+        with database.transaction():
+            for quote_ID in quotes_IDs:
+                match remove_quote_from_database(quote_ID, database):
+                    case Err(err):
+                        error_message = f"Kunne ikke slette sitat {quote_ID} grunnet: {{\n    {err.msg}\n}}"
+                        error_type = type(err)
+                        errors.append(error_type(error_message))
+                        continue
+                    case Ok(reciept):
+                        reciepts.append(reciept)
+    except Exception as err:
+        error_message = f"Ingen av sitatene ble slettet grunnet feil: {{\n    {str(err)}\n}}\nKontakt {CONTACT_PERSON}"
+        return [], [DatabaseError(error_message)]
 
     return reciepts, errors
 
 
+async def commit_changes(database: Database[Quote]) -> list[BaseError]:
+    """Venter til endringene er skrevet til disk. Feiler det, er endringene rullet tilbake
+
+    Returns:
+        list[BaseError]: Feilmeldinger hvis lagringen feilet
+    """
+    try:
+        await database.commit()
+    except Exception as err:
+        error_message = f"Endringene ble ikke lagret til disk, og er rullet tilbake, grunnet feil: {{\n    {str(err)}\n}}\nKontakt {CONTACT_PERSON}"
+        return [DatabaseError(error_message)]
+    return []
+
+
 def remove_quote_from_database(
     ID: int, database: Database[Quote]
 ) -> Result[str, BaseError]:
@@ -131,7 +157,7 @@ def remove_quote_from_database(
         Result[str, str]: Ok(Kvittering) | Err(Feilmelding)
     """
     try:
-        if ID not in database.keys():
+        if database.get(ID) is None:
             return create_error(f"Entry {ID} doesn't exist in the database")
         deleted_quote = database.pop(ID)
     except Exception as err:
@@ -141,12 +167,13 @@ def remove_quote_from_database(
 
 
 def format_quotes(
-    raw_quotes: str, message_id: int
+    raw_quotes: str, message_id: int, database: Optional[Database[Quote]] = None
 ) -> Result[tuple[list[Quote], list[BaseError]], BaseError]:
     """Formatterer sitatene
 
     Args:
         raw_quotes (str): hele rå-meldingen med sitater
+        database (Optional[Database[Quote]]): gir advarsler om navn som ligner på eksisterende navn
 
     Returns:
         Result[tuple[list[Quote], list[BaseError]], BaseError]: Ok( [sitater], [advarsler] ) | Err(Feilmelding)
@@ -165,7 +192,7 @@ def format_quotes(
 
     for raw_quote in raw_quotes_list:
         quote = format_one_quote(raw_quote, message_id)
-        match validate_quote_format(quote):
+        match validate_quote_format(quote, database):
             case Err(err):
                 error_message = create_validation_error_message(quote, raw_quote, err)
                 return Err(FormatError(error_message))
@@ -192,7 +219,7 @@ def create_validation_error_message(
         + "is not a valid quote.\n\n"
         + "[After formatting]\n"
         + f"Speaker: {quote.speaker}\n"
-        + f"Audience: {quote.audience}\n"
+        + f"Audience: {list(quote.audience)}\n"
         + f"Quote: {{\n    {quote_print_formatted}\n}}\n\n"
         + f"Error: {{\n    {error.msg}\n}}"
         + "\n\n"
@@ -229,13 +256,16 @@ def format_one_quote(raw_quote: str, message_id: int) -> Quote:
     return quote_obj
 
 
-def validate_quote_format(quote_obj: Quote) -> Result[list[BaseError], BaseError]:
+def validate_quote_format(
+    quote_obj: Quote, database: Optional[Database[Quote]] = None
+) -> Result[list[BaseError], BaseError]:
     """sjekker om et sitat er gyldig
 
     Args:
         speaker (str): forteller
         audience (list[str]): tilskuere
         quote (str): sitatet
+        database (Optional[Database[Quote]]): for å advare om skrivefeil i navnet til avsenderen
 
     Returns:
         Result[list[BaseError], BaseError]: Ok(advarsel-flagg), Err(Feilmelding)
@@ -254,6 +284,16 @@ def validate_quote_format(quote_obj: Quote) -> Result[list[BaseError], BaseError
         if audience_member == "":
             return Err(FormatError("Audience-member can not be an empty string"))
 
+    if database is not None:
+        similar_names = database.similar_names(speaker)
+        if len(similar_names) != 0:
+            warnings.append(
+                FormatError(
+                    f"{speaker} finnes ikke fra før, men ligner på {', '.join(similar_names)}. Skrivefeil?",
+                    ErrorLevel.WARNING,
+                )
+            )
+
     # TODO: Legge til flere tilfeller av ugyldig input
     # TODO: Legge til hjelpsomme flagg ved mistanke om skrivefeil; eks sitat uten hermetegn; er det egentlig et nytt sitat?
     return Ok(warnings)
@@ -266,14 +306,7 @@ def validate_quote(quote: Quote, database: Database) -> Result[None, BaseError]:
 
 
 def quote_is_in_database(quote: Quote, database: Database[Quote]) -> bool:
-    for quote_entry in database.values():
-        if (
-            quote.speaker == quote_entry.speaker
-            and quote.audience == quote_entry.audience
-            and quote.quote == quote_entry.quote
-        ):
-            return True
-    return False
+    return len(database.get_by_content(quote)) != 0
 
 
 def remove_quotation_marks(raw_string: str) -> str:
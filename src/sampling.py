@@ -0,0 +1,124 @@
+"""
+Tilfeldig utvalg av sitat uten å lage en liste av hele databasen for hvert trekk.
+
+Nøklene ligger i en tett liste. set_value legger til på slutten, og pop flytter
+det siste elementet inn i hullet (swap-remove), så et uniformt trekk er O(1).
+Vektet trekk bruker et Fenwick-tre over de samme posisjonene og er O(log n).
+"""
+from __future__ import annotations
+import random
+from typing import Any, Optional
+from index import Index
+
+
+class FenwickTree:
+    """Prefikssummer av vekter, med oppdatering og søk i O(log n)"""
+
+    def __init__(self, capacity: int = 16) -> None:
+        self.tree = [0.0] * (capacity + 1)
+        self.weights = [0.0] * capacity
+        self.total = 0.0
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def grow(self, capacity: int) -> None:
+        weights = self.weights + [0.0] * (capacity - len(self.weights))
+        self.weights = weights
+        # Bygger treet på nytt i O(n)
+        tree = [0.0] * (capacity + 1)
+        for i, weight in enumerate(weights, start=1):
+            tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def set(self, position: int, weight: float) -> None:
+        delta = weight - self.weights[position]
+        self.weights[position] = weight
+        self.total += delta
+        i = position + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, target: float) -> int:
+        """Den første posisjonen der prefikssummen blir større enn target"""
+        position = 0
+        step = 1 << (len(self.weights).bit_length() - 1)
+        while step != 0:
+            next_position = position + step
+            if next_position < len(self.tree) and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+        return position
+
+
+class SamplingIndex(Index[Any]):
+    """
+    Tett liste over nøklene for uniformt trekk, og vekter for trekk som
+    foretrekker sitat som har blitt vist sjelden (vekt 1 / (1 + antall visninger)).
+    Antall visninger ligger bare i minnet, og overlever at indeksen bygges på nytt.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self.rng = rng if rng is not None else random.Random()
+        self.keys: list[int] = []
+        self.positions: dict[int, int] = {}
+        self.shown: dict[int, int] = {}
+        self.weights = FenwickTree()
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.positions.clear()
+        self.weights = FenwickTree()
+
+    def add(self, key: int, value: Any) -> None:
+        if key in self.positions:
+            return
+        position = len(self.keys)
+        self.positions[key] = position
+        self.keys.append(key)
+        if position >= len(self.weights):
+            self.weights.grow(2 * len(self.weights))
+        self.weights.set(position, self.weight(key))
+
+    def remove(self, key: int, value: Any) -> None:
+        position = self.positions.pop(key, None)
+        if position is None:
+            return
+        last_position = len(self.keys) - 1
+        last_key = self.keys.pop()
+        if position != last_position:
+            self.keys[position] = last_key
+            self.positions[last_key] = position
+            self.weights.set(position, self.weights.weights[last_position])
+        self.weights.set(last_position, 0.0)
+        self.shown.pop(key, None)
+
+    def weight(self, key: int) -> float:
+        return 1 / (1 + self.shown.get(key, 0))
+
+    def random_key(self) -> Optional[int]:
+        if len(self.keys) == 0:
+            return None
+        return self.keys[self.rng.randrange(len(self.keys))]
+
+    def weighted_random_key(self) -> Optional[int]:
+        """Trekker en nøkkel med sannsynlighet proporsjonal med vekten, og teller den som vist"""
+        if len(self.keys) == 0:
+            return None
+        position = self.weights.find(self.rng.random() * self.weights.total)
+        # Avrundingsfeil kan i sjeldne tilfeller peke forbi siste nøkkel
+        key = self.keys[min(position, len(self.keys) - 1)]
+        self.mark_shown(key)
+        return key
+
+    def mark_shown(self, key: int) -> None:
+        position = self.positions.get(key)
+        if position is None:
+            return
+        self.shown[key] = self.shown.get(key, 0) + 1
+        self.weights.set(position, self.weight(key))
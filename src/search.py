@@ -0,0 +1,159 @@
+"""
+Fulltekstsøk i sitatteksten med en invertert indeks.
+
+Ordene blir normalisert (NFKC, casefold) slik at "Øl", "øl" og "ØL" er samme ord,
+æ/ø/å blir behandlet som egne bokstaver, og svenske/tyske ä/ö regnes som æ/ø.
+Andre aksenter blir fjernet ("kafé" -> "kafe").
+
+Spørringer:
+    hytta øl          begge ordene må være med (AND)
+    "bare én øl"      ordene må stå etter hverandre (frase)
+"""
+from __future__ import annotations
+import heapq
+import math
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Callable
+from index import Index
+from quote import Quote
+
+WORD_PATTERN = re.compile(r"\w+")
+PHRASE_PATTERN = re.compile(r'"([^"]*)"|«([^»]*)»|“([^”]*)”|(\S+)')
+# Bokstavene som ikke skal miste "aksenten" sin når ordene normaliseres
+NORWEGIAN_LETTERS = {"æ": "æ", "ø": "ø", "å": "å", "ä": "æ", "ö": "ø"}
+
+# BM25-parametere
+K1 = 1.2
+B = 0.75
+
+
+# Ordforrådet er mye mindre enn antall ord i sitatene, så de fleste ordene er normalisert før
+@lru_cache(maxsize=65536)
+def normalize_word(word: str) -> str:
+    word = unicodedata.normalize("NFKC", word).casefold()
+    if word.isascii():
+        return word
+    letters = []
+    for letter in word:
+        if letter in NORWEGIAN_LETTERS:
+            letters.append(NORWEGIAN_LETTERS[letter])
+            continue
+        decomposed = unicodedata.normalize("NFD", letter)
+        letters.append("".join(c for c in decomposed if not unicodedata.combining(c)))
+    return "".join(letters)
+
+
+def tokenize(text: str) -> list[str]:
+    # NFC først, så en å skrevet som a + ring blir ett ord og ikke to
+    text = unicodedata.normalize("NFC", text)
+    return [normalize_word(word) for word in WORD_PATTERN.findall(text)]
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """Deler spørringen i termer. En term er enten ett ord eller en frase (flere ord).
+    Alle termene må finnes i sitatet.
+    """
+    terms: list[list[str]] = []
+    for match in PHRASE_PATTERN.finditer(query):
+        text = next(group for group in match.groups() if group is not None)
+        words = tokenize(text)
+        if match.group(4) is not None:
+            # Et ord uten hermetegn som "sa-det" blir flere ord, men ikke en frase
+            terms.extend([word] for word in words)
+        elif len(words) != 0:
+            terms.append(words)
+    return terms
+
+
+class SearchIndex(Index[Quote]):
+    """ord -> sitat-ID -> posisjonene til ordet i sitatet"""
+
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[int, list[int]]] = {}
+        self.lengths: dict[int, int] = {}
+        self.total_length = 0
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.lengths.clear()
+        self.total_length = 0
+
+    def add(self, key: int, value: Quote) -> None:
+        words = tokenize(value.quote)
+        for position, word in enumerate(words):
+            self.postings.setdefault(word, {}).setdefault(key, []).append(position)
+        self.lengths[key] = len(words)
+        self.total_length += len(words)
+
+    def remove(self, key: int, value: Quote) -> None:
+        length = self.lengths.pop(key, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for word in set(tokenize(value.quote)):
+            keys = self.postings.get(word)
+            if keys is None:
+                continue
+            keys.pop(key, None)
+            if len(keys) == 0:
+                del self.postings[word]
+
+    def search(self, query: str, limit: int = 10) -> list[int]:
+        """IDene til sitatene som passer best med spørringen, best først"""
+        terms = parse_query(query)
+        if len(terms) == 0:
+            return []
+        words = {word for term in terms for word in term}
+        if any(word not in self.postings for word in words):
+            return []
+
+        # Starter med det sjeldneste ordet, så mengden blir liten med en gang
+        rarest_first = sorted(words, key=lambda word: len(self.postings[word]))
+        candidates = set(self.postings[rarest_first[0]])
+        for word in rarest_first[1:]:
+            candidates.intersection_update(self.postings[word])
+            if len(candidates) == 0:
+                return []
+
+        phrases = [term for term in terms if len(term) > 1]
+        if len(phrases) != 0:
+            candidates = {
+                key
+                for key in candidates
+                if all(self.has_phrase(key, phrase) for phrase in phrases)
+            }
+        return heapq.nlargest(limit, candidates, key=self.scorer(words))
+
+    def has_phrase(self, key: int, phrase: list[str]) -> bool:
+        starts = set(self.postings[phrase[0]][key])
+        for offset, word in enumerate(phrase[1:], start=1):
+            starts.intersection_update(
+                position - offset for position in self.postings[word][key]
+            )
+            if len(starts) == 0:
+                return False
+        return True
+
+    def scorer(self, words: set[str]) -> Callable[[int], float]:
+        """BM25: sjeldne ord teller mest, og korte sitat slår lange med samme treff"""
+        count = len(self.lengths)
+        lengths = self.lengths
+        length_scale = K1 * B * count / max(self.total_length, 1)
+        length_base = K1 * (1 - B)
+        weighted_postings = []
+        for word in words:
+            keys = self.postings[word]
+            idf = math.log(1 + (count - len(keys) + 0.5) / (len(keys) + 0.5))
+            weighted_postings.append((idf * (K1 + 1), keys))
+
+        def score(key: int) -> float:
+            length_norm = length_base + length_scale * lengths[key]
+            total = 0.0
+            for weight, keys in weighted_postings:
+                frequency = len(keys[key])
+                total += weight * frequency / (frequency + length_norm)
+            return total
+
+        return score
@@ -0,0 +1,307 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from result import Result, Err, Ok
+from error import BaseError, create_error
+from deck import ShuffleDeck
+from index import Index
+from quote import Quote
+from name_index import NameIndex
+from sampling import SamplingIndex
+from search import SearchIndex
+import storage_format
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    speaker TEXT NOT NULL,
+    audience TEXT NOT NULL,
+    quote TEXT NOT NULL,
+    message_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_message_id ON quotes (message_id);
+CREATE INDEX IF NOT EXISTS quotes_content ON quotes (speaker, audience, quote);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# sqlite3 cacher de kompilerte spørringene, så vi gjenbruker de samme strengene
+SELECT_ONE = "SELECT id, speaker, audience, quote, message_id FROM quotes WHERE id = ?"
+SELECT_ALL = "SELECT id, speaker, audience, quote, message_id FROM quotes ORDER BY id"
+SELECT_KEYS = "SELECT id FROM quotes ORDER BY id"
+SELECT_BY_MESSAGE_ID = "SELECT id FROM quotes WHERE message_id = ?"
+SELECT_BY_CONTENT = "SELECT id FROM quotes WHERE speaker = ? AND audience = ? AND quote = ?"
+COUNT = "SELECT COUNT(*) FROM quotes"
+MAX_ID = "SELECT MAX(id) FROM quotes"
+UPSERT = """
+INSERT INTO quotes (id, speaker, audience, quote, message_id) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    speaker = excluded.speaker,
+    audience = excluded.audience,
+    quote = excluded.quote,
+    message_id = excluded.message_id
+"""
+DELETE = "DELETE FROM quotes WHERE id = ?"
+GET_META = "SELECT value FROM meta WHERE key = ?"
+SET_META = """
+INSERT INTO meta (key, value) VALUES (?, ?)
+ON CONFLICT (key) DO UPDATE SET value = excluded.value
+"""
+
+LAST_ID = "last_id"
+# Satt til 1 når sitatene fra den gamle databasen er flyttet over, se migrate_from_pickle
+MIGRATED = "migrated"
+
+Row = tuple[int, str, str, str, int]
+
+
+class SqliteDatabase:
+    """
+    Samme grensesnitt som database.Database[Quote], men sitatene ligger i en SQLite-fil
+    med egne kolonner og indekser, og ikke i minnet.
+    Indeksene som ikke finnes i SQLite (som søkeindeksen) holdes i minnet
+    og bygges på nytt ved oppstart og etter en rollback.
+    """
+
+    def __init__(self, database_file_path: Path) -> None:
+        self.CONTACT_PERSON = "Thorbjørn Djupvik"
+        self.file_path = database_file_path
+        self.connection = sqlite3.connect(database_file_path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        # ID-telleren holdes i minnet. meta.last_id oppdateres bare ved sletting,
+        # ellers er største id i tabellen nok til å finne den igjen
+        match self.load_ID():
+            case Ok(ID_value):
+                self.last_ID = ID_value
+            case Err(err):
+                raise ValueError(err.msg)
+        max_ID = self.connection.execute(MAX_ID).fetchone()[0]
+        self.last_ID = max(self.last_ID, max_ID or 0)
+
+        self.search_index = SearchIndex()
+        self.name_index = NameIndex()
+        self.sampling_index = SamplingIndex()
+        self.deck = ShuffleDeck(
+            database_file_path.with_name(database_file_path.name + ".deck")
+        )
+        self.indexes: list[Index[Quote]] = []
+        self.add_index(self.search_index)
+        self.add_index(self.name_index)
+        self.add_index(self.sampling_index)
+        self.add_index(self.deck)
+
+    def add_index(self, index: Index[Quote]) -> None:
+        index.rebuild(self.items())
+        self.indexes.append(index)
+
+    def rebuild_indexes(self) -> None:
+        items = self.items()
+        for index in self.indexes:
+            index.rebuild(items)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Samler alle endringene i blokken til én SQLite-transaksjon.
+        Ved unntak blir alt rullet tilbake. En transaksjon inni en annen blir en del av den ytre.
+        """
+        if self.connection.in_transaction:
+            yield
+            return
+        start_ID = self.last_ID
+        self.connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            self.last_ID = start_ID
+            self.rebuild_indexes()
+            raise
+        self.connection.execute("COMMIT")
+
+    def set_value(self, key: int, value: Quote) -> None:
+        old_value = self.get(key) if len(self.indexes) != 0 else None
+        self.connection.execute(UPSERT, (key, *quote_to_row(value)))
+        for index in self.indexes:
+            if old_value is not None:
+                index.remove(key, old_value)
+            index.add(key, value)
+
+    def get(self, key: int) -> Optional[Quote]:
+        row = self.connection.execute(SELECT_ONE, (key,)).fetchone()
+        if row is None:
+            return None
+        return row_to_quote(row)
+
+    def items(self) -> list[tuple[int, Quote]]:
+        return [
+            (row[0], row_to_quote(row))
+            for row in self.connection.execute(SELECT_ALL)
+        ]
+
+    def values(self) -> list[Quote]:
+        return [row_to_quote(row) for row in self.connection.execute(SELECT_ALL)]
+
+    def keys(self) -> list[int]:
+        return [row[0] for row in self.connection.execute(SELECT_KEYS)]
+
+    def pop(self, key: int) -> Quote:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        with self.transaction():
+            self.connection.execute(DELETE, (key,))
+            self.connection.execute(SET_META, (LAST_ID, self.last_ID))
+            for index in self.indexes:
+                index.remove(key, value)
+        return value
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, Quote]]:
+        """Sitatene som passer best med søket, best først. Se search.parse_query"""
+        results = []
+        for key in self.search_index.search(query, limit):
+            value = self.get(key)
+            if value is not None:
+                results.append((key, value))
+        return results
+
+    def get_by_message_id(self, message_id: int) -> set[int]:
+        """IDene til alle sitatene som ble laget av meldingen"""
+        return {
+            row[0]
+            for row in self.connection.execute(SELECT_BY_MESSAGE_ID, (message_id,))
+        }
+
+    def get_by_speaker(self, name: str) -> set[int]:
+        """IDene til sitatene der avsenderen heter (omtrent) name"""
+        return self.name_index.by_speaker(name)
+
+    def get_by_audience(self, name: str) -> set[int]:
+        """IDene til sitatene der name (omtrent) er i publikum"""
+        return self.name_index.by_audience(name)
+
+    def similar_names(self, name: str) -> list[str]:
+        """Navn i databasen som ligner på name, men er skrevet annerledes"""
+        return self.name_index.near_misses(name)
+
+    def get_by_content(self, value: Quote) -> set[int]:
+        """IDene til alle sitatene med samme innhold (quote_fingerprint) som value"""
+        speaker, audience, quote, _ = quote_to_row(value)
+        return {
+            row[0]
+            for row in self.connection.execute(
+                SELECT_BY_CONTENT, (speaker, audience, quote)
+            )
+        }
+
+    def __len__(self) -> int:
+        return self.connection.execute(COUNT).fetchone()[0]
+
+    def load_ID(self) -> Result[int, BaseError]:
+        try:
+            row = self.connection.execute(GET_META, (LAST_ID,)).fetchone()
+        except sqlite3.Error as err:
+            return create_error(str(err))
+        if row is None:
+            return Ok(0)
+        return Ok(row[0])
+
+    def create_new_quote_ID(self) -> Result[int, BaseError]:
+        """Genererer sitat-ID
+
+        Returns:
+            Result[int, str]: Ok(sitat-ID) | Err(Feilmelding)
+        """
+        self.last_ID += 1
+        return Ok(self.last_ID)
+
+    def get_random_element(self, weighted: bool = False) -> Optional[Quote]:
+        """Et tilfeldig sitat. Se Database.get_random_element"""
+        if weighted:
+            key = self.sampling_index.weighted_random_key()
+        else:
+            key = self.sampling_index.random_key()
+        if key is None:
+            return
+        return self.get(key)
+
+    def draw_from_deck(self) -> Optional[Quote]:
+        """Neste sitat fra kortstokken. Se Database.draw_from_deck"""
+        key = self.deck.draw()
+        if key is None:
+            return
+        return self.get(key)
+
+    async def commit(self) -> None:
+        """Venter til alle endringer så langt er skrevet til disk.
+        SQLite skriver synkront, så her er alt allerede skrevet.
+        """
+
+    def close(self) -> None:
+        self.connection.close()
+        self.deck.close()
+
+
+def quote_to_row(quote: Quote) -> tuple[str, str, str, int]:
+    return (
+        quote.speaker,
+        json.dumps(quote.audience, ensure_ascii=False),
+        quote.quote,
+        quote.message_id,
+    )
+
+
+def row_to_quote(row: Row) -> Quote:
+    _, speaker, audience, quote, message_id = row
+    return Quote(speaker, json.loads(audience), quote, message_id)
+
+
+def migrate_from_pickle(
+    database: SqliteDatabase, database_path: Path, ID_path: Path
+) -> None:
+    """Flytter sitatene fra den gamle databasen (.database.jsonl + journal, eller en eldre
+    dill-fil) og .ID over i SQLite, én gang. Etterpå er meta.migrated satt, så sitat som
+    blir slettet i SQLite ikke kommer tilbake fra den gamle filen ved neste oppstart.
+    De gamle filene blir bare lest, og ligger igjen urørt.
+    """
+    row = database.connection.execute(GET_META, (MIGRATED,)).fetchone()
+    if row is not None and row[0] == 1:
+        return
+    if not database_path.is_file() or len(database) != 0:
+        # Ingenting å flytte, eller flyttet før meta.migrated fantes
+        with database.transaction():
+            database.connection.execute(SET_META, (MIGRATED, 1))
+        return
+
+    data, last_ID = storage_format.read_database_files(database_path)
+    match load_legacy_ID(ID_path):
+        case Ok(ID_value):
+            last_ID = max(last_ID, ID_value)
+        case Err(_):
+            pass
+    rows = [(key, *quote_to_row(value)) for key, value in data.items()]
+
+    with database.transaction():
+        database.connection.executemany(UPSERT, rows)
+        database.connection.execute(SET_META, (LAST_ID, last_ID))
+        database.connection.execute(SET_META, (MIGRATED, 1))
+    database.last_ID = max(database.last_ID, last_ID)
+    # executemany går forbi set_value, så indeksene i minnet vet ikke om sitatene ennå
+    database.rebuild_indexes()
+
+
+def load_legacy_ID(ID_path: Path) -> Result[int, BaseError]:
+    """ID-telleren fra den gamle .ID-filen"""
+    try:
+        ID_str = ID_path.read_text().strip()
+    except OSError as err:
+        return create_error(str(err))
+    if not ID_str.isdigit():
+        return create_error(f"{ID_str} er ikke et heltall")
+    return Ok(int(ID_str))
@@ -0,0 +1,151 @@
+"""
+Vakthund for event-loopen.
+
+En task på loopen sover INTERVAL sekunder om gangen og måler hvor mye for sent den
+våkner (lag). Mens loopen er blokkert kan den ikke måle noe, så en egen tråd følger med
+på når tasken sist kjørte. Henger loopen mer enn THRESHOLD, tar tråden stacken til
+loop-tråden, altså koden som blokkerer (f.eks. Database.write_snapshot), og logger den
+sammen med hendelsen som kjørte. Én post per blokkering.
+
+Lag blir lagt i metrics (teknobyen_loop_lag_seconds og !stats), og de siste målingene
+ligger i LoopWatchdog.lags.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Optional
+from log import get_event_context, log_event
+import metrics
+
+INTERVAL = 0.1
+THRESHOLD = 0.25
+STACK_DEPTH = 20
+RECENT_LAGS = 1000
+# Hvor ofte lag-persentilene blir logget
+LOG_INTERVAL = 300.0
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float = INTERVAL, threshold: float = THRESHOLD) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: deque[float] = deque(maxlen=RECENT_LAGS)
+        self.stalls = 0
+        self.heartbeat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task[None]] = None
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        """Kalles fra event-loopen (on_ready). Gjør ingenting hvis vakthunden allerede går"""
+        if self.task is not None and not self.task.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopped.clear()
+        self.task = self.loop.create_task(self.measure(), name="loop-watchdog")
+        threading.Thread(target=self.monitor, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def measure(self) -> None:
+        next_log = time.monotonic() + LOG_INTERVAL
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.heartbeat = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            metrics.loop_lag(lag)
+            if now >= next_log:
+                next_log = now + LOG_INTERVAL
+                log_event("Event-loop-forsinkelse", stalls=self.stalls, **self.percentiles())
+
+    def monitor(self) -> None:
+        reported = False
+        while not self.stopped.wait(self.threshold / 4):
+            blocked = time.monotonic() - self.heartbeat - self.interval
+            if blocked < self.threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                self.report_stall(blocked)
+
+    def report_stall(self, blocked: float) -> None:
+        self.stalls += 1
+        metrics.count("loop_stalls")
+        fields: dict[str, Any] = {"blocked_ms": round(blocked * 1000)}
+
+        frame = sys._current_frames().get(self.loop_thread_id)  # type: ignore[arg-type]
+        if frame is not None:
+            stack = traceback.format_stack(frame)[-STACK_DEPTH:]
+            fields["stack"] = "".join(stack)
+
+        # Tasken som holder loopen, og hendelsen den hører til (set_event_context i bot.py)
+        task = asyncio.current_task(self.loop) if self.loop is not None else None
+        if task is not None:
+            fields["task"] = task.get_name()
+            coro = task.get_coro()
+            fields["coroutine"] = getattr(coro, "__qualname__", repr(coro))
+            fields.update(get_event_context(task))
+        log_event("Event-loopen er blokkert", logging.WARNING, **fields)
+
+    def percentiles(self) -> dict[str, float]:
+        """p50/p99/maks av de siste målingene, i millisekunder"""
+        lags = sorted(self.lags)
+        if len(lags) == 0:
+            return {}
+        return {
+            "p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            "max_ms": round(lags[-1] * 1000, 2),
+            "mean_ms": round(statistics.fmean(lags) * 1000, 2),
+        }
+
+    def summary(self) -> str:
+        lags = self.percentiles()
+        if len(lags) == 0:
+            return "Event-loopen: ingen målinger ennå"
+        return (
+            f"Event-loopen, siste {len(self.lags)} målinger: p50 {lags['p50_ms']} ms, "
+            f"p99 {lags['p99_ms']} ms, maks {lags['max_ms']} ms. Blokkert {self.stalls} ganger"
+        )
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+def configure(interval: float = INTERVAL, threshold: float = THRESHOLD) -> None:
+    global _watchdog
+    _watchdog = LoopWatchdog(interval, threshold)
+
+
+def disable() -> None:
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+    _watchdog = None
+
+
+def get_watchdog() -> Optional[LoopWatchdog]:
+    return _watchdog
+
+
+def start() -> None:
+    if _watchdog is not None:
+        _watchdog.start()
+
+
+configure()
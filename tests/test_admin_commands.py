@@ -0,0 +1,15 @@
+from types import SimpleNamespace
+import admin_commands
+import parse_command
+
+
+def test_stats_shows_the_command_cache() -> None:
+    parse_command.COMMAND_CACHE.clear()
+    parse_command.COMMAND_CACHE.stats = parse_command.CacheStats()
+    parse_command.cached_command_parser("random")
+    parse_command.cached_command_parser("random")
+
+    context = SimpleNamespace(database=SimpleNamespace())
+    stats = admin_commands.StatsCommand().main({}, context).unwrap()  # type: ignore[arg-type]
+
+    assert "Kommando-cache: hits=1 misses=1 bypassed=0 hit_rate=50% size=1/256" in stats
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any
+from database import AsyncDatabase
+from quote import Quote
+import quote_utils
+
+
+def test_failed_async_write_is_rolled_back(tmp_path: Path) -> None:
+    database: AsyncDatabase[Quote] = AsyncDatabase(tmp_path / ".database", tmp_path / ".ID")
+    quote = Quote("Kari", ["Ola"], "Hvem tok oppvasken?", 1)
+    write_journal = database._write_journal
+
+    def failing_write_journal(payload: bytes) -> None:
+        raise OSError("Disken er full")
+
+    async def add_failing() -> tuple[list[str], list[Any]]:
+        database._write_journal = failing_write_journal  # type: ignore[method-assign]
+        reciepts, errors = quote_utils.add_quotes([quote], database)
+        assert len(reciepts) == 1 and len(errors) == 0
+        return reciepts, await quote_utils.commit_changes(database)
+
+    async def add_other() -> list[Any]:
+        database._write_journal = write_journal  # type: ignore[method-assign]
+        quote_utils.add_quotes([Quote("Thorbjørn", ["Alle"], "Bare én øl til", 2)], database)
+        return await quote_utils.commit_changes(database)
+
+    async def run() -> None:
+        _, commit_errors = await asyncio.create_task(add_failing())
+        assert len(commit_errors) == 1
+        # Sitatet er borte fra minnet og indeksene, og kan legges til på nytt
+        assert database.get_by_content(quote) == set()
+        assert database.search("oppvasken") == []
+        assert database._failed_writes == 0
+
+        # En annen hendelse får ikke feilen fra den første
+        assert await asyncio.create_task(add_other()) == []
+        reciepts, errors = quote_utils.add_quotes([quote], database)
+        assert len(reciepts) == 1 and len(errors) == 0
+        assert await quote_utils.commit_changes(database) == []
+
+    try:
+        asyncio.run(run())
+    finally:
+        database.close()
+
+    reopened: AsyncDatabase[Quote] = AsyncDatabase(tmp_path / ".database", tmp_path / ".ID")
+    try:
+        assert sorted(quote.speaker for quote in reopened.values()) == ["Kari", "Thorbjørn"]
+    finally:
+        reopened.close()
+
+
+def test_failed_write_behind_flush_is_retried(tmp_path: Path) -> None:
+    database: AsyncDatabase[Quote] = AsyncDatabase(
+        tmp_path / ".database", tmp_path / ".ID", flush_interval_ms=10
+    )
+    write_journal = database._write_journal
+    failures = [OSError("Disken er full")]
+
+    def failing_once(payload: bytes) -> None:
+        if len(failures) != 0:
+            raise failures.pop()
+        write_journal(payload)
+
+    database._write_journal = failing_once  # type: ignore[method-assign]
+    try:
+        database.set_value(1, Quote("Kari", ["Ola"], "Hvem tok oppvasken?", 1))
+        time.sleep(0.2)
+        database.set_value(2, Quote("Ola", ["Kari"], "Ikke jeg", 2))
+        time.sleep(0.2)
+        assert len(failures) == 0
+        assert database._unflushed == []
+        assert database._failed_writes == 0
+        assert database._pending_writes == {}
+    finally:
+        database.close()
+
+    reopened: AsyncDatabase[Quote] = AsyncDatabase(tmp_path / ".database", tmp_path / ".ID")
+    try:
+        assert sorted(quote.speaker for quote in reopened.values()) == ["Kari", "Ola"]
+    finally:
+        reopened.close()
+
+
+def test_compaction_skips_writes_still_in_the_queue(tmp_path: Path) -> None:
+    # Hver skriving kompakterer, også mens neste transaksjon står i kø og senere feiler
+    database: AsyncDatabase[Quote] = AsyncDatabase(
+        tmp_path / ".database", tmp_path / ".ID", compaction_threshold=1
+    )
+    write_journal = database._write_journal
+
+    def slow_then_failing(payload: bytes) -> None:
+        if "Ikke jeg".encode() in payload:
+            raise OSError("Disken er full")
+        write_journal(payload)
+        if "oppvasken".encode() in payload:
+            # Gir tid til at neste transaksjon havner i køen før kompakteringen
+            time.sleep(0.1)
+
+    database._write_journal = slow_then_failing  # type: ignore[method-assign]
+
+    async def run() -> None:
+        quote_utils.add_quotes([Quote("Kari", ["Ola"], "Hvem tok oppvasken?", 1)], database)
+        quote_utils.add_quotes([Quote("Ola", ["Kari"], "Ikke jeg", 2)], database)
+        assert len(await quote_utils.commit_changes(database)) == 1
+
+    try:
+        asyncio.run(run())
+        assert [quote.speaker for quote in database.values()] == ["Kari"]
+    finally:
+        database.close()
+
+    reopened: AsyncDatabase[Quote] = AsyncDatabase(tmp_path / ".database", tmp_path / ".ID")
+    try:
+        assert [quote.speaker for quote in reopened.values()] == ["Kari"]
+    finally:
+        reopened.close()
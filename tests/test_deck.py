@@ -0,0 +1,52 @@
+import random
+from pathlib import Path
+from deck import ShuffleDeck
+
+
+def open_deck(path: Path, keys: list[int], seed: int = 0) -> ShuffleDeck:
+    deck = ShuffleDeck(path, random.Random(seed))
+    for key in keys:
+        deck.add(key, None)
+    return deck
+
+
+def test_no_repeats_within_a_cycle(tmp_path: Path) -> None:
+    deck = open_deck(tmp_path / ".deck", list(range(10)))
+    try:
+        first = [deck.draw() for _ in range(10)]
+        second = [deck.draw() for _ in range(10)]
+        assert sorted(first) == list(range(10))
+        assert sorted(second) == list(range(10))
+        assert deck.cycle == 1
+    finally:
+        deck.close()
+
+
+def test_deck_survives_add_remove_and_restart(tmp_path: Path) -> None:
+    path = tmp_path / ".deck"
+    deck = open_deck(path, [1, 2, 3, 4, 5])
+    try:
+        drawn = [deck.draw() for _ in range(2)]
+        deck.add(6, None)
+        removed = next(key for key in [1, 2, 3, 4, 5] if key not in drawn)
+        deck.remove(removed, None)
+    finally:
+        deck.close()
+
+    # Etter en omstart bygges indeksen på nytt fra databasen
+    keys = [key for key in [1, 2, 3, 4, 5, 6] if key != removed]
+    deck = open_deck(path, keys, seed=1)
+    try:
+        rest = [deck.draw() for _ in range(len(keys) - len(drawn))]
+        assert sorted(drawn + rest) == keys
+        assert deck.cycle == 0
+        assert deck.draw() in keys
+        assert deck.cycle == 1
+    finally:
+        deck.close()
+
+    deck = open_deck(path, keys)
+    try:
+        assert deck.cycle == 1 and len(deck.drawn) == 1
+    finally:
+        deck.close()
@@ -0,0 +1,51 @@
+import asyncio
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+from database import AsyncDatabase
+from quote import Quote
+
+os.environ.setdefault("quotes", "1")
+import message_handler
+
+
+class Channel:
+    id = 1
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def send(self, content: str = "", **kwargs: Any) -> None:
+        self.sent.append(content)
+
+
+def test_edit_stops_when_removing_the_old_quotes_fails(tmp_path: Path) -> None:
+    database: AsyncDatabase[Quote] = AsyncDatabase(tmp_path / ".database", tmp_path / ".ID")
+    handler = message_handler.QuotesHandler()
+    channel = Channel()
+    old_message = SimpleNamespace(id=10, content='Kari til Ola\n"Hvem tok oppvasken?"', channel=channel)
+    new_message = SimpleNamespace(id=10, content='Kari til Ola\n"Hvem tok oppvasken i går?"', channel=channel)
+    write_journal = database._write_journal
+    failures: list[OSError] = []
+
+    def failing_once(payload: bytes) -> None:
+        if len(failures) != 0:
+            raise failures.pop()
+        write_journal(payload)
+
+    database._write_journal = failing_once  # type: ignore[method-assign]
+
+    async def run() -> None:
+        await handler.on_new_message(old_message, database)  # type: ignore[arg-type]
+        # Bare slettingen feiler; de nye sitatene ville blitt lagret
+        failures.append(OSError("Disken er full"))
+        await handler.on_edit_message(old_message, new_message, database)  # type: ignore[arg-type]
+
+    try:
+        asyncio.run(run())
+        # Slettingen er rullet tilbake, og de nye sitatene kom ikke i tillegg
+        assert [quote.quote for quote in database.values()] == ['"Hvem tok oppvasken?"']
+        assert "rullet tilbake" in channel.sent[-1]
+    finally:
+        database.close()
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Optional
+import output
+from output import MAX_MESSAGES_PER_EVENT, MESSAGE_LIMIT, SEPARATOR, chunk_parts, split_part
+
+
+class Channel:
+    id = 1
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, Optional[Any]]] = []
+
+    async def send(self, content: str, file: Optional[Any] = None) -> None:
+        self.sent.append((content, file))
+
+
+def test_part_exactly_at_the_limit_is_not_split() -> None:
+    part = "x" * MESSAGE_LIMIT
+    assert chunk_parts([part]) == [part]
+
+
+def test_single_part_over_the_limit_is_split() -> None:
+    part = "x" * (MESSAGE_LIMIT * 2 + 1)
+    chunks = chunk_parts([part])
+    assert [len(chunk) for chunk in chunks] == [MESSAGE_LIMIT, MESSAGE_LIMIT, 1]
+    assert "".join(chunks) == part
+
+
+def test_split_prefers_line_breaks() -> None:
+    lines = ["a" * 1200, "b" * 1200, "c" * 100]
+    assert split_part("\n".join(lines)) == [lines[0], lines[1] + "\n" + lines[2]]
+
+
+def test_parts_are_packed_up_to_the_limit() -> None:
+    first = "a" * 1000
+    fits = "b" * (MESSAGE_LIMIT - len(first) - len(SEPARATOR))
+    assert chunk_parts([first, fits]) == [first + SEPARATOR + fits]
+    assert chunk_parts([first, fits + "b"]) == [first, fits + "b"]
+    assert chunk_parts(["", first, ""]) == [first]
+
+
+def test_overflow_goes_to_a_file() -> None:
+    output.set_rate_limit(None)
+    channel = Channel()
+    parts = [str(i) * MESSAGE_LIMIT for i in range(MAX_MESSAGES_PER_EVENT + 2)]
+
+    asyncio.run(output.send_parts(parts, channel))
+
+    assert len(channel.sent) == MAX_MESSAGES_PER_EVENT
+    assert [content for content, _ in channel.sent[:-1]] == parts[: MAX_MESSAGES_PER_EVENT - 1]
+    note, file = channel.sent[-1]
+    assert "3 meldinger" in note
+    assert file.filename == output.OVERFLOW_FILENAME
+    assert file.fp.getvalue().decode() == SEPARATOR.join(parts[MAX_MESSAGES_PER_EVENT - 1 :])
+    assert all(file is None for _, file in channel.sent[:-1])
@@ -0,0 +1,82 @@
+"""
+Lexer-parseren mot den gamle parseren (benchmarks/legacy_parse_command.py).
+Grammatikken er den samme, bortsett fra forskjellene i DIFFERENCES.
+"""
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable
+import pytest
+from result import Err, Ok
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+import legacy_parse_command
+import parse_command
+
+SAME = [
+    "random",
+    "  random  ",
+    "search øl",
+    'search "bare én øl" --limit 5',
+    "search 'x y'",
+    "search (a b) c",
+    "search -rf ord",
+    'search "a b" ord -x --limit 3 --speaker Kari',
+    "profile start --seconds 10 --rate 0.5",
+    "help search",
+    'search "uavsluttet',
+    "search (uavsluttet",
+]
+
+# (kommando, den gamle parseren, lexeren)
+DIFFERENCES = [
+    # Flagg eller "-"/"--" helt til slutt: den gamle parseren krasjet med IndexError
+    ("search -r", ("raise", "IndexError"), ("ok", "Command: search {\n    Flag: r\n}", "")),
+    ("search -", ("raise", "IndexError"), ("ok", "Command: search", "-")),
+    ("search --", ("raise", "IndexError"), ("ok", "Command: search", "--")),
+    # Den andre typen hermetegn senere i kommandoen: det første hermetegnet bestemmer nå
+    ('search "it\'s"', ("err",), ("ok", "Command: search {\n    Expr: it's\n}", "")),
+    (
+        "search \"a\" 'b'",
+        ("ok", "Command: search {\n    Expr: b\n}", ""),
+        ("ok", "Command: search {\n    Expr: a\n    Expr: b\n}", ""),
+    ),
+]
+
+TOKENS = ["søk", "øl", "-r", "-rf", "--limit", "5", '"to ord"', "'to ord'", "(a b)", "x_1", ""]
+
+
+def outcome(parser: Callable[[str], Any], command: str) -> tuple[Any, ...]:
+    try:
+        result = parser(command)
+    except Exception as err:
+        return ("raise", type(err).__name__)
+    match result:
+        case Ok((tree, tail)):
+            return ("ok", str(tree), tail)
+        case Err(_):
+            return ("err",)
+    raise AssertionError(result)
+
+
+@pytest.mark.parametrize("command", SAME)
+def test_same_as_legacy_parser(command: str) -> None:
+    expected = outcome(legacy_parse_command.command_parser, command)
+    assert outcome(parse_command.command_parser, command) == expected
+
+
+@pytest.mark.parametrize("command, legacy, lexer", DIFFERENCES)
+def test_documented_differences(command: str, legacy: tuple[Any, ...], lexer: tuple[Any, ...]) -> None:
+    assert outcome(legacy_parse_command.command_parser, command) == legacy
+    assert outcome(parse_command.command_parser, command) == lexer
+
+
+def test_random_commands_match_legacy_parser() -> None:
+    rng = random.Random(0)
+    for _ in range(2000):
+        command = "search " + " ".join(rng.choices(TOKENS, k=rng.randrange(1, 8)))
+        # Utenfor forskjellene i DIFFERENCES
+        if ('"' in command and "'" in command) or command.split()[-1].startswith("-"):
+            continue
+        expected = outcome(legacy_parse_command.command_parser, command)
+        assert outcome(parse_command.command_parser, command) == expected, command
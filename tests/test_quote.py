@@ -0,0 +1,18 @@
+import sys
+from dataclasses import fields
+from quote import Quote
+
+
+def test_from_record_matches_the_constructor() -> None:
+    quote = Quote("Thorbjørn", ["Alle", "Kari"], "Bare én øl til", 10)
+    # Alle feltene, så et nytt felt som from_record ikke setter får testen til å feile
+    record = [getattr(quote, field.name) for field in fields(Quote)]
+
+    fast = Quote.from_record(*record)
+
+    assert fast == quote
+    assert hash(fast) == hash(quote)
+    assert all(getattr(fast, field.name) == getattr(quote, field.name) for field in fields(Quote))
+    assert fast.speaker is sys.intern("Thorbjørn")
+    assert fast.audience[1] is sys.intern("Kari")
+    assert Quote.from_record("Kari", [], "Hei", 1).audience == ()
@@ -0,0 +1,60 @@
+import random
+from collections import Counter
+from sampling import FenwickTree, SamplingIndex
+
+
+def prefix_sums(weights: list[float]) -> list[float]:
+    sums, total = [], 0.0
+    for weight in weights:
+        total += weight
+        sums.append(total)
+    return sums
+
+
+def test_fenwick_tree_finds_prefix_sums_after_updates() -> None:
+    tree = FenwickTree(4)
+    weights = [1.0, 2.0, 0.0, 3.0]
+    for position, weight in enumerate(weights):
+        tree.set(position, weight)
+    tree.grow(8)
+    weights += [0.0] * 4
+    tree.set(5, 4.0)
+    tree.set(1, 0.5)
+    weights[5], weights[1] = 4.0, 0.5
+
+    assert tree.total == sum(weights)
+    for target in [0.0, 0.99, 1.0, 1.49, 1.5, 4.49, 4.5, 8.49]:
+        expected = next(i for i, total in enumerate(prefix_sums(weights)) if total > target)
+        assert tree.find(target) == expected
+
+
+def test_swap_remove_keeps_keys_and_weights_together() -> None:
+    index = SamplingIndex(random.Random(1))
+    for key in range(1, 21):
+        index.add(key, None)
+    index.mark_shown(20)
+    index.mark_shown(20)
+    index.remove(3, None)
+    index.remove(20, None)
+    index.remove(3, None)
+
+    assert sorted(index.keys) == [key for key in range(1, 20) if key != 3]
+    assert all(index.keys[index.positions[key]] == key for key in index.keys)
+    # Nøkkelen som ble flyttet inn i hullet tar med seg vekten sin
+    assert index.weights.weights[index.positions[19]] == 1.0
+    assert index.weights.total == len(index.keys)
+    assert set(Counter(index.random_key() for _ in range(500))) == set(index.keys)
+
+
+def test_weighted_draw_prefers_quotes_shown_rarely() -> None:
+    index = SamplingIndex(random.Random(2))
+    for key in [1, 2]:
+        index.add(key, None)
+    for _ in range(9):
+        index.mark_shown(1)
+
+    draws = Counter(index.weighted_random_key() for _ in range(20))
+    assert draws[2] > draws[1]
+    # Visningene jevner seg ut, og vektene følger med
+    assert abs(index.shown[1] - index.shown[2]) < 9
+    assert index.weights.weights[:2] == [index.weight(1), index.weight(2)]
@@ -0,0 +1,63 @@
+from pathlib import Path
+from database import Database
+from quote import Quote
+from sqlite_database import SqliteDatabase, migrate_from_pickle
+
+
+def create_old_database(directory: Path) -> tuple[Path, Path]:
+    database_path = directory / ".database.jsonl"
+    ID_path = directory / ".ID"
+    old_database: Database[Quote] = Database(database_path, ID_path)
+    quotes = [
+        Quote("Thorbjørn", ["Alle"], "Bare én øl til", 1),
+        Quote("Kari", ["Ola"], "Hvem tok oppvasken?", 2),
+    ]
+    for quote in quotes:
+        old_database.set_value(old_database.create_new_quote_ID().unwrap(), quote)
+    old_database.save_data()
+    old_database.close()
+    return database_path, ID_path
+
+
+def test_indexes_are_ready_right_after_migration(tmp_path: Path) -> None:
+    database_path, ID_path = create_old_database(tmp_path)
+    database = SqliteDatabase(tmp_path / ".database.sqlite3")
+    try:
+        migrate_from_pickle(database, database_path, ID_path)
+
+        assert len(database) == 2
+        assert [quote.speaker for _, quote in database.search("oppvasken")] == ["Kari"]
+        assert database.get_by_speaker("Thorbjorn") == {1}
+        assert database.get_random_element() is not None
+        assert database.get_random_element(weighted=True) is not None
+        assert database.draw_from_deck() is not None
+        assert database.create_new_quote_ID().unwrap() == 3
+    finally:
+        database.close()
+
+
+def test_deleted_quotes_stay_deleted_after_restart(tmp_path: Path) -> None:
+    database_path, ID_path = create_old_database(tmp_path)
+    old_files = sorted(path.name for path in tmp_path.iterdir())
+    sqlite_path = tmp_path / ".database.sqlite3"
+
+    database = SqliteDatabase(sqlite_path)
+    try:
+        migrate_from_pickle(database, database_path, ID_path)
+        for key in database.keys():
+            database.pop(key)
+    finally:
+        database.close()
+    # Den gamle databasen blir bare lest, og ingen nye filer havner ved siden av den
+    new_files = sorted(
+        path.name for path in tmp_path.iterdir() if not path.name.startswith(sqlite_path.name)
+    )
+    assert new_files == old_files
+
+    database = SqliteDatabase(sqlite_path)
+    try:
+        migrate_from_pickle(database, database_path, ID_path)
+        assert len(database) == 0
+        assert database.create_new_quote_ID().unwrap() == 3
+    finally:
+        database.close()
@@ -0,0 +1,41 @@
+import io
+import sys
+from pathlib import Path
+from database import Database, rename_legacy_files
+from quote import Quote
+import storage_format
+
+
+def test_read_snapshot_builds_the_same_quotes() -> None:
+    data = {
+        1: Quote("Thorbjørn", ["Alle", "Kari"], "Bare én øl til", 10),
+        2: Quote("Kari", [], "Hvem tok oppvasken?", 11),
+    }
+    file = io.BytesIO()
+    storage_format.write_snapshot(file, data, 7)
+    file.seek(0)
+
+    loaded, last_ID = storage_format.read_snapshot(file)
+
+    assert last_ID == 7
+    assert loaded == data
+    assert {hash(quote) for quote in loaded.values()} == {hash(quote) for quote in data.values()}
+    assert loaded[1].audience == ("Alle", "Kari")
+    assert loaded[1].speaker is sys.intern("Thorbjørn")
+
+
+def test_legacy_snapshot_name_is_renamed(tmp_path: Path) -> None:
+    old_path = tmp_path / ".database.pkl"
+    new_path = tmp_path / ".database.jsonl"
+    old_database: Database[Quote] = Database(old_path, tmp_path / ".ID")
+    old_database.set_value(1, Quote("Kari", ["Ola"], "Hvem tok oppvasken?", 1))
+    old_database.close()
+
+    rename_legacy_files(old_path, new_path)
+
+    assert not old_path.exists()
+    database: Database[Quote] = Database(new_path, tmp_path / ".ID")
+    try:
+        assert [quote.speaker for quote in database.values()] == ["Kari"]
+    finally:
+        database.close()